@@ -6,39 +6,97 @@ from orchestrator import ChangeManagementOrchestrator
 
 load_dotenv()
 
-async def run_analysis():
+# Minimum seconds between re-renders caused by streamed LLM tokens
+TOKEN_RENDER_INTERVAL = 0.25
+
+def item_label(item):
+    # Tickets routed to several repositories get one entry per repository
+    return f"{item['ticket']} → {item['repo']}" if item.get("repo") else item["ticket"]
+
+def format_issue(issue):
+    if issue["status"] != "created":
+        return f"❌ {item_label(issue)}: {issue['error']}"
+    if issue.get("url"):
+        return f"✅ {item_label(issue)}: [#{issue['number']}]({issue['url']})"
+    return f"✅ {item_label(issue)}: created"
+
+def render_progress(state, final_context=None):
+    lines = ["## Analysis Complete" if final_context is not None else "## Analysis Running..."]
+    if state["run_id"]:
+        lines.append(f"Run ID: `{state['run_id']}`")
+
+    if state["plan"] is not None:
+        lines.append("\n### Plan" + (" (reused)" if state["plan_reused"] else ""))
+        for index, step in enumerate(state["plan"]):
+            status = state["steps"].get(index)
+            if status is None:
+                marker = "⏳ pending"
+            elif status["status"] == "running":
+                marker = "▶️ running"
+            elif status["status"] == "success":
+                marker = f"✅ {status['duration']}s"
+            else:
+                marker = f"❌ {status.get('error') or 'failed'}"
+            lines.append(f"- `{step.get('capability')}` ({step.get('agent')}): {marker}")
+
+    if final_context is not None:
+        tickets = final_context.get("tickets", [])
+        lines.append(f"\n### 1. Jira Tickets Found\nFound **{len(tickets)}** tickets.")
+
+    if state["analyses"] or state["partial"]:
+        lines.append(f"\n### 2. Impact Analysis\nAnalyzed **{len(state['analyses'])}** items.")
+        for key, analysis in state["analyses"].items():
+            lines.append(f"\n#### {key}\n{analysis}")
+        for key, partial in state["partial"].items():
+            if key not in state["analyses"]:
+                lines.append(f"\n#### {key} (streaming...)\n{partial}")
+
+    if state["issues"]:
+        lines.append("\n### 3. GitHub Actions")
+        lines.extend(f"- {issue}" for issue in state["issues"])
+
+    return "\n".join(lines)
+
+async def run_analysis(resume_run_id=""):
     orchestrator = ChangeManagementOrchestrator()
-    
-    # We can yield progress updates here if we modify the orchestrator to yield
-    # For now, we'll just run it and return the final result
-    
-    results = []
-    yield gr.update(value="Starting Analysis...", visible=True)
+    state = {"run_id": None, "plan": None, "plan_reused": False, "steps": {}, "analyses": {}, "partial": {}, "issues": []}
+    last_token_render = 0.0
+
+    yield gr.update(value="Resuming Analysis..." if resume_run_id else "Starting Analysis...", visible=True)
     
     try:
-        # Run the orchestrator
-        # Note: In a real app, we'd want to stream logs from the agents
-        final_context = await orchestrator.run()
-        
-        # Format output
-        tickets = final_context.get("tickets", [])
-        impacts = final_context.get("impact_analysis", [])
-        issues = final_context.get("created_issues", [])
-        
-        output_md = f"""
-        ## Analysis Complete
-        
-        ### 1. Jira Tickets Found
-        Found **{len(tickets)}** tickets.
-        
-        ### 2. Impact Analysis
-        Analyzed **{len(impacts)}** items.
-        
-        ### 3. GitHub Actions
-        {chr(10).join([f"- {issue}" for issue in issues])}
-        """
-        
-        yield gr.update(value=output_md, visible=True)
+        # Render progress as the orchestrator reports it instead of waiting for the whole run
+        async for event in orchestrator.stream(run_id=(resume_run_id or "").strip() or None):
+            kind = event["type"]
+            if kind == "run_started":
+                state["run_id"] = event["run_id"]
+            elif kind == "plan_generated":
+                state["plan"] = event["plan"]
+                state["plan_reused"] = event["reused"]
+            elif kind == "step_started":
+                state["steps"][event["index"]] = {"status": "running"}
+            elif kind == "step_finished":
+                state["steps"][event["index"]] = event
+            elif kind == "llm_token":
+                state["partial"][event["ticket"]] = state["partial"].get(event["ticket"], "") + event["text"]
+                if event["time"] - last_token_render < TOKEN_RENDER_INTERVAL:
+                    continue
+                last_token_render = event["time"]
+            elif kind == "ticket_analyzed":
+                state["partial"].pop(event["ticket"], None)
+                state["analyses"][item_label(event)] = event["analysis"] or f"Analysis failed: {event['error']}"
+            elif kind == "issue_created":
+                state["issues"].append(format_issue(event))
+            elif kind == "run_finished":
+                # Work restored from a checkpoint produced no events; take it from the final context
+                final_context = event["context"]
+                for item in final_context.get("design_analysis", []):
+                    state["analyses"].setdefault(item_label(item), item["analysis"])
+                if not state["issues"]:
+                    state["issues"] = [format_issue(issue) for issue in final_context.get("created_issues", [])]
+                yield gr.update(value=render_progress(state, event["context"]), visible=True)
+                continue
+            yield gr.update(value=render_progress(state), visible=True)
         
     except Exception as e:
         import traceback
@@ -55,10 +113,11 @@ with gr.Blocks(title="Autonomous Change Management") as demo:
     
     with gr.Row():
         start_btn = gr.Button("Start Analysis", variant="primary", scale=1)
+        resume_id = gr.Textbox(label="Resume run ID (optional)", placeholder="e.g. 20250101-120000-ab12cd34", scale=2)
     
     output_display = gr.Markdown("Ready to start...", visible=True)
     
-    start_btn.click(run_analysis, [], [output_display])
+    start_btn.click(run_analysis, [resume_id], [output_display])
 
 if __name__ == "__main__":
     demo.launch(theme=gr.themes.Soft())
@@ -1,172 +1,548 @@
 import os
-import google.generativeai as genai
+import json
+import base64
+import fnmatch
+import asyncio
+from datetime import datetime, timezone
 from google.adk import Agent
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp_pool import github_server_params, get_shared_pool
+import model_router
+from context_cache import get_context_cache
+import design_index
+import events
+from routing import DEFAULT_REPO_OWNER, DEFAULT_REPO_NAME, repo_slug
 
-# Configure Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
+# Maximum number of per-ticket Gemini requests in flight (overridable per run via context)
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "8"))
+# Tickets packed into one analysis request; 1 keeps one request per ticket
+ANALYSIS_BATCH_SIZE = int(os.getenv("ANALYSIS_BATCH_SIZE", "1"))
+
+# Which repository files count as design documents (comma-separated fnmatch globs)
+DESIGN_DOC_GLOBS = [g.strip() for g in os.getenv("DESIGN_DOC_GLOBS", "*.md,*.puml").split(",") if g.strip()]
+# Bounded fan-out for concurrent get_file_contents calls, and how deep the directory walk goes
+FILE_FETCH_CONCURRENCY = int(os.getenv("DESIGN_FETCH_CONCURRENCY", "8"))
+TREE_MAX_DEPTH = int(os.getenv("DESIGN_TREE_MAX_DEPTH", "6"))
+# Directories never searched for design docs (fnmatch globs on the directory name)
+DESIGN_SKIP_DIRS = [g.strip() for g in os.getenv(
+    "DESIGN_SKIP_DIRS", ".*,node_modules,vendor,third_party,dist,build,target,venv,__pycache__,site-packages"
+).split(",") if g.strip()]
+# When set, only these directories (path prefixes such as docs,architecture) are searched
+DESIGN_DOC_DIRS = [d.strip().strip("/") for d in os.getenv("DESIGN_DOC_DIRS", "").split(",") if d.strip().strip("/")]
+# Upper bound on directory listings when the server has no tree tool (one call each)
+DESIGN_WALK_MAX_DIRS = int(os.getenv("DESIGN_WALK_MAX_DIRS", "50"))
+
+# Retrieval mode: prompt budget for retrieved design sections, and how many docs to index
+DESIGN_CONTEXT_TOKENS = int(os.getenv("DESIGN_CONTEXT_TOKENS", "1500"))
+DESIGN_MAX_DOCS = int(os.getenv("DESIGN_MAX_DOCS", "200"))
+# Budget for the run-wide context when it is shared by every ticket as a cached prefix
+DESIGN_PREFIX_TOKENS = int(os.getenv("DESIGN_PREFIX_TOKENS", "6000"))
+
+SNAPSHOT_DIR = os.path.join("data", "design_snapshots")
+# A snapshot refreshed more recently than this is served without revalidating it, so a
+# daemon analyzing one ticket at a time does not rediscover the repository per ticket
+DESIGN_REVALIDATE_SECONDS = float(os.getenv("DESIGN_REVALIDATE_SECONDS", "600"))
+# Background revalidations in flight, and the repos they are for
+_background_tasks = set()
+_revalidating = set()
+
+def _snapshot_age(snapshot):
+    try:
+        refreshed = datetime.fromisoformat(snapshot.get("refreshed_at"))
+    except (TypeError, ValueError):
+        return None
+    return (datetime.now(timezone.utc) - refreshed).total_seconds()
+
+async def wait_for_background_tasks(timeout=60):
+    # For short-lived callers (the CLI): lets a revalidation finish before the event loop closes
+    if _background_tasks:
+        await asyncio.wait(list(_background_tasks), timeout=timeout)
+
+def _matches_design_globs(path):
+    return any(fnmatch.fnmatch(path, pattern) for pattern in DESIGN_DOC_GLOBS)
+
+def _searchable_dir(path):
+    parts = path.strip("/").split("/")
+    if any(fnmatch.fnmatch(part, pattern) for part in parts for pattern in DESIGN_SKIP_DIRS):
+        return False
+    if not DESIGN_DOC_DIRS:
+        return True
+    # Inside an allowed directory, or on the way down to one
+    path = "/".join(parts)
+    return any(path == d or path.startswith(f"{d}/") or d.startswith(f"{path}/") for d in DESIGN_DOC_DIRS)
+
+def _searchable_file(path):
+    directory = path.rsplit("/", 1)[0] if "/" in path else ""
+    return _matches_design_globs(path) and (not directory or _searchable_dir(directory))
+
+def _walk_priority(path):
+    # When the listing budget runs short, doc-like directories are listed first
+    name = path.rsplit("/", 1)[-1].lower()
+    return (0 if any(hint in name for hint in ("doc", "design", "arch", "adr", "spec", "wiki")) else 1, path)
+
+def _parse_tree(text):
+    # Recursive tree replies are either the raw git tree ({"tree": [...]}) or a flat entry list
+    data = json.loads(text)
+    entries = data.get("tree", []) if isinstance(data, dict) else data
+    candidates = []
+    for entry in entries or []:
+        if not isinstance(entry, dict) or entry.get("type") not in ("blob", "file"):
+            continue
+        path = entry.get("path", "")
+        if _searchable_file(path):
+            candidates.append({"path": path, "sha": entry.get("sha")})
+    return candidates
+
+def _decode_file_result(text):
+    # get_file_contents returns the GitHub content object; older servers return raw text
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return text, None
+    if not isinstance(data, dict) or "content" not in data:
+        return text, None
+    content = data.get("content") or ""
+    if data.get("encoding") == "base64":
+        try:
+            content = base64.b64decode(content).decode("utf-8", errors="replace")
+        except (ValueError, TypeError):
+            pass
+    return content, data.get("sha")
+
+def _analysis_prefix(repo_owner, repo_name, code_context):
+    # Everything that is the same for every ticket of a run, so it can be cached once
+    return f"""
+        You analyze the design impact of Jira tickets on the codebase {repo_owner}/{repo_name}.
+
+        Current Design Context (relevant design doc sections):
+        {code_context}
+
+        Task (for each ticket independently):
+        1. Identify the current design architecture based on the context.
+        2. List specific components that need changes.
+        3. List specific components that need to be redesigned or created.
+
+        Output Format:
+        **Current Design**: <summary>
+        **Components to Change**: <list>
+        **Components to Redesign/Create**: <list>
+        """
+
+def _ticket_suffix(ticket):
+    fields = ticket.get('fields', {})
+    return f"""
+        Ticket: {ticket.get('key')} - {fields.get('summary', '')}
+        Description: {fields.get('description', '')}
+        """
+
+def _batch_suffix(batch):
+    ticket_block = ""
+    for ticket in batch:
+        fields = ticket.get('fields', {})
+        ticket_block += f"Ticket: {ticket.get('key')} - {fields.get('summary', '')}\nDescription: {fields.get('description', '')}\n\n"
+    return f"""
+        Tickets:
+        {ticket_block}
+        Return a JSON object keyed by ticket key. Each value is that ticket's analysis in the output format above.
+        """
 
 class DesignAnalyzer(Agent):
     def __init__(self, name="DesignAnalyzer"):
         super().__init__(name=name)
         self.description = "Analyzes the current design and identifies component changes."
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
 
     async def run(self, context):
-        repo_owner = "akshay-mp"
-        repo_name = "simple_production_rag"
-        tickets = context.get("tickets", [])
+        repo_owner = context.get("repo_owner") or DEFAULT_REPO_OWNER
+        repo_name = context.get("repo_name") or DEFAULT_REPO_NAME
+        slug = repo_slug(repo_owner, repo_name)
+        all_tickets = context.get("tickets", [])
+        # Tickets analyzed before a resumed run's failure are taken from its checkpoint
+        checkpoint = context.get("checkpoint")
+        done = checkpoint.analyzed(slug) if checkpoint else {}
+
+        def report(key, analysis, error):
+            events.emit("ticket_analyzed", ticket=key, repo=slug, analysis=analysis, error=error)
+            if checkpoint is not None and error is None:
+                checkpoint.record_analysis(key, analysis, slug)
+        tickets = [ticket for ticket in all_tickets if ticket.get('key') not in done]
+        if done:
+            print(f"[{self.name}] {len(all_tickets) - len(tickets)} tickets already analyzed in this run.")
         print(f"[{self.name}] Analyzing design impact for {len(tickets)} tickets on {repo_owner}/{repo_name}...")
+        if not tickets:
+            return {"design_analysis": [{"ticket": t.get('key'), "repo": slug, "analysis": done[t.get('key')]} for t in all_tickets], "analysis_errors": []}
         
         design_analysis = []
         
-        # Connect to GitHub MCP to fetch code context
-        env = os.environ.copy()
-        token = os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN")
-        if token:
-            env["GITHUB_PERSONAL_ACCESS_TOKEN"] = token
-            
-        server_params = StdioServerParameters(
-            command="npx",
-            args=["-y", "@modelcontextprotocol/server-github"],
-            env=env
-        )
+        # Connect to GitHub MCP to fetch code context (warm session from the shared pool)
+        server_params = github_server_params()
+        pool = context.get("mcp_pool") or get_shared_pool()
         
         code_context = ""
+        index = None
         try:
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    
-                    # Strategy:
-                    # 1. Explore repo structure (root + likely folders) to find .md and .puml files.
-                    # 2. Use LLM to select the most relevant design documents.
-                    # 3. Read the selected documents.
-                    
-                    candidate_files = []
-                    folders_to_check = ["", "docs", "specifications", "design", "architecture"]
-                    checked_folders = set()
-                    
-                    print(f"[{self.name}] Exploring repository structure for design documents...")
-                    
-                    for folder in folders_to_check:
-                        if folder in checked_folders:
-                            continue
-                        checked_folders.add(folder)
-                        
-                        try:
-                            # Adjust path for root
-                            path_arg = folder if folder else "."
-                            # Note: list_directory behavior might vary, assuming it returns list of entries
-                            entries = await session.call_tool("list_directory", arguments={"owner": repo_owner, "repo": repo_name, "path": path_arg})
-                            
-                            if entries.content:
-                                # Parse entries - assuming text output or JSON-like structure in content
-                                # We'll do a simple text parsing if it's a string representation, 
-                                # or iterate if it's a list. The MCP client usually returns a list of Content objects.
-                                # Let's assume the text content lists files.
-                                # For robustness, we'll assume we can get filenames.
-                                # If the tool returns a JSON string, we parse it. 
-                                # If it returns plain text lines, we split.
-                                
-                                text_content = entries.content[0].text
-                                lines = text_content.splitlines()
-                                
-                                for line in lines:
-                                    # Simple heuristic to extract filename from ls-like output
-                                    # This depends heavily on the tool output format.
-                                    # Let's assume the tool returns just filenames or "type name"
-                                    cleaned_line = line.strip()
-                                    if not cleaned_line: continue
-                                    
-                                    # If line contains directory info, add to folders_to_check if relevant
-                                    # For now, let's just look for extensions in the line
-                                    if ".md" in cleaned_line or ".puml" in cleaned_line:
-                                        # Construct full path
-                                        # This is a bit hacky without structured output, but works for many ls outputs
-                                        # We'll try to extract the last word as filename if it looks like a file
-                                        parts = cleaned_line.split()
-                                        filename = parts[-1] 
-                                        if filename.endswith(".md") or filename.endswith(".puml"):
-                                            full_path = f"{folder}/{filename}" if folder else filename
-                                            candidate_files.append(full_path)
-                                            
-                        except Exception as e:
-                            # print(f"[{self.name}] Error listing {folder}: {e}")
-                            pass
-
-                    print(f"[{self.name}] Found candidate design files: {candidate_files}")
-                    
-                    selected_files = []
-                    if candidate_files:
-                        # Ask LLM to select relevant files
-                        selection_prompt = f"""
-                        I have found the following files in the repository that might contain design documentation:
-                        {json.dumps(candidate_files)}
-                        
-                        Which of these files are most likely to contain the high-level system design, architecture, or component diagrams?
-                        Select up to 3 most relevant files.
-                        Return ONLY a JSON list of the selected file paths.
-                        """
-                        try:
-                            response = self.model.generate_content(selection_prompt)
-                            text = response.text.strip()
-                            if text.startswith("```json"): text = text[7:]
-                            if text.endswith("```"): text = text[:-3]
-                            selected_files = json.loads(text)
-                            print(f"[{self.name}] LLM selected design files: {selected_files}")
-                        except Exception as e:
-                            print(f"[{self.name}] LLM selection failed: {e}. Defaulting to all candidates.")
-                            selected_files = candidate_files[:3] # Limit to 3
-                    else:
-                        # Fallback if discovery failed
-                        selected_files = ["README.md"]
-
-                    # Read selected files
-                    for file_path in selected_files:
-                        try:
-                            result = await session.call_tool("get_file_contents", arguments={"owner": repo_owner, "repo": repo_name, "path": file_path})
-                            if result.content:
-                                code_context += f"File: {file_path}\nContent:\n{result.content[0].text[:3000]}\n\n"
-                        except Exception as e:
-                            print(f"[{self.name}] Could not read {file_path}: {e}")
-
+            # Stale-while-revalidate: a persisted snapshot of the design docs is served
+            # immediately and checked against the repo's current blob SHAs in the background.
+            snapshot = self._load_snapshot(repo_owner, repo_name)
+            if snapshot and snapshot.get("files"):
+                age = _snapshot_age(snapshot)
+                if age is not None and age < DESIGN_REVALIDATE_SECONDS:
+                    print(f"[{self.name}] Using design-context snapshot from {snapshot.get('refreshed_at')}.")
+                else:
+                    print(f"[{self.name}] Using design-context snapshot from {snapshot.get('refreshed_at')}; revalidating in background.")
+                    self._schedule_revalidation(pool, server_params, repo_owner, repo_name, snapshot)
+            else:
+                snapshot = await self._refresh_snapshot(pool, server_params, repo_owner, repo_name, None)
+            if design_index.available():
+                # Retrieval mode: the snapshot's docs feed a local BM25 index (only changed SHAs
+                # are re-chunked) and every ticket gets the sections most relevant to it.
+                index = design_index.DesignIndex(repo_owner, repo_name)
+                index.update(snapshot.get("files", {}))
+            else:
+                code_context = self._context_from_snapshot(snapshot)
 
         except Exception as e:
             print(f"[{self.name}] Error fetching code context: {e}")
             # Fallback
+            index = None
             code_context = "Could not fetch remote code. Assuming standard Python structure."
 
-        for ticket in tickets:
+        def context_for(ticket_list, token_budget=DESIGN_CONTEXT_TOKENS):
+            if index is None:
+                return code_context
+            query = " ".join(
+                f"{t.get('fields', {}).get('summary', '')} {t.get('fields', {}).get('description', '') or ''}"
+                for t in ticket_list
+            )
+            return index.build_context(query, token_budget)
+
+        # Prompts are laid out as a stable prefix (instructions + design context) and a
+        # small ticket suffix. With a context-cache backend the prefix is built once for
+        # the whole run and uploaded once; every call then sends only its suffix.
+        backend = get_context_cache()
+        shared_prefix = None
+        cached_model = None
+        if tickets and backend is not None:
+            # Resolved per run so model_routes.json edits reach a long-running daemon; the
+            # cache is built for this model, so batched calls use it too
+            model = model_router.model_for("ticket_analysis")
+            shared_prefix = _analysis_prefix(repo_owner, repo_name, context_for(tickets, DESIGN_PREFIX_TOKENS))
+            handle = await backend.acquire(model, shared_prefix)
+            if handle is not None:
+                cached_model = backend.model_for(handle, model)
+
+        def prefix_for(ticket_list):
+            if cached_model is not None:
+                return shared_prefix, cached_model
+            # No handle (no backend, prefix below the cache minimum, or the upload failed):
+            # the prefix goes inline with every call, so keep it to the per-ticket retrieval
+            return _analysis_prefix(repo_owner, repo_name, context_for(ticket_list)), None
+
+        # Tickets are analyzed concurrently through the async Gemini API. The semaphore
+        # bounds in-flight requests; gather keeps results in ticket order.
+        concurrency = int(context.get("analysis_concurrency") or ANALYSIS_CONCURRENCY)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        batch_size = int(context.get("analysis_batch_size") or ANALYSIS_BATCH_SIZE)
+
+        if batch_size > 1:
+            # Batched mode: K tickets share one request (and one copy of the prefix)
+            batches = [tickets[i:i + batch_size] for i in range(0, len(tickets), batch_size)]
+            batch_results = await asyncio.gather(*[
+                self._analyze_batch(batch, *prefix_for(batch), semaphore, report)
+                for batch in batches
+            ])
+            results = [result for batch in batch_results for result in batch]
+        else:
+            results = await asyncio.gather(*[
+                self._analyze_ticket(ticket, *prefix_for([ticket]), semaphore, report)
+                for ticket in tickets
+            ])
+
+        analysis_errors = []
+        by_key = {key: (analysis, error) for key, analysis, error in results}
+        for ticket in all_tickets:
             key = ticket.get('key')
-            summary = ticket.get('fields', {}).get('summary', '')
-            description = ticket.get('fields', {}).get('description', '')
-            
-            prompt = f"""
-            Analyze the design impact of this Jira ticket on the codebase {repo_owner}/{repo_name}.
-            
-            Ticket: {key} - {summary}
-            Description: {description}
-            
-            Current Design Context (from README):
-            {code_context}
-            
-            Task:
-            1. Identify the current design architecture based on the context.
-            2. List specific components that need changes.
-            3. List specific components that need to be redesigned or created.
-            
-            Output Format:
-            **Current Design**: <summary>
-            **Components to Change**: <list>
-            **Components to Redesign/Create**: <list>
-            """
-            
-            response = self.model.generate_content(prompt)
-            analysis = response.text
-            design_analysis.append({"ticket": key, "analysis": analysis})
+            if key in done:
+                design_analysis.append({"ticket": key, "repo": slug, "analysis": done[key]})
+                continue
+            analysis, error = by_key[key]
+            if error:
+                analysis_errors.append({"ticket": key, "repo": slug, "error": error})
+            else:
+                design_analysis.append({"ticket": key, "repo": slug, "analysis": analysis})
+
+        if analysis_errors:
+            print(f"[{self.name}] {len(analysis_errors)} of {len(tickets)} tickets failed analysis.")
             
-        return {"design_analysis": design_analysis}
+        return {"design_analysis": design_analysis, "analysis_errors": analysis_errors}
+
+    async def _discover_candidates(self, session, tool_names, repo_owner, repo_name):
+        print(f"[{self.name}] Exploring repository structure for design documents...")
+
+        if "get_repository_tree" in tool_names:
+            # One recursive-tree request returns every path with its blob SHA
+            try:
+                result = await session.call_tool("get_repository_tree", arguments={"owner": repo_owner, "repo": repo_name, "recursive": True})
+                if result.content:
+                    candidate_files = _parse_tree(result.content[0].text)
+                    print(f"[{self.name}] Found candidate design files: {[c['path'] for c in candidate_files]}")
+                    return candidate_files
+            except Exception as e:
+                print(f"[{self.name}] Recursive tree listing failed: {e}. Walking directories instead.")
+
+        # Servers without a tree tool: walk directory listings level by level,
+        # listing every directory of a level concurrently. Each listing is an API
+        # call, so skipped directories are pruned and the walk stops after
+        # DESIGN_WALK_MAX_DIRS listings.
+        candidate_files = []
+        semaphore = asyncio.Semaphore(FILE_FETCH_CONCURRENCY)
+
+        async def list_dir(path):
+            async with semaphore:
+                try:
+                    result = await session.call_tool("get_file_contents", arguments={"owner": repo_owner, "repo": repo_name, "path": path})
+                except Exception:
+                    return []
+            if not result.content:
+                return []
+            try:
+                entries = json.loads(result.content[0].text)
+            except ValueError:
+                return []
+            return entries if isinstance(entries, list) else []
+
+        level = [""]
+        depth = 0
+        listed = 0
+        while level and depth <= TREE_MAX_DEPTH:
+            budget = DESIGN_WALK_MAX_DIRS - listed
+            if budget <= 0:
+                print(f"[{self.name}] Directory walk stopped after {listed} listings; {len(level)} directories not searched.")
+                break
+            if len(level) > budget:
+                print(f"[{self.name}] Directory walk listing {budget} of {len(level)} directories at depth {depth}.")
+                level = sorted(level, key=_walk_priority)[:budget]
+            listings = await asyncio.gather(*[list_dir(path) for path in level])
+            listed += len(level)
+            level = []
+            for entries in listings:
+                for entry in entries:
+                    if not isinstance(entry, dict):
+                        continue
+                    path = entry.get("path") or ""
+                    if entry.get("type") == "dir":
+                        if _searchable_dir(path):
+                            level.append(path)
+                    elif entry.get("type") == "file" and _matches_design_globs(path):
+                        candidate_files.append({"path": path, "sha": entry.get("sha")})
+            depth += 1
+
+        print(f"[{self.name}] Found candidate design files: {[c['path'] for c in candidate_files]}")
+        return candidate_files
+
+    async def _select_files(self, candidate_files):
+        paths = [c["path"] for c in candidate_files]
+        if not paths:
+            # Fallback if discovery failed
+            return ["README.md"]
+
+        # Ask LLM to select relevant files
+        selection_prompt = f"""
+        I have found the following files in the repository that might contain design documentation:
+        {json.dumps(paths)}
+
+        Which of these files are most likely to contain the high-level system design, architecture, or component diagrams?
+        Select up to 3 most relevant files.
+        Return ONLY a JSON list of the selected file paths.
+        """
+        try:
+            text = await model_router.generate_async("design_selection", selection_prompt, validate=model_router.parse_json_reply)
+            selected_files = model_router.parse_json_reply(text)
+            print(f"[{self.name}] LLM selected design files: {selected_files}")
+            return selected_files
+        except Exception as e:
+            print(f"[{self.name}] LLM selection failed: {e}. Defaulting to all candidates.")
+            return paths[:3] # Limit to 3
+
+    async def _refresh_snapshot(self, pool, server_params, repo_owner, repo_name, previous):
+        previous = previous or {}
+        session = await pool.get_session(server_params)
+        tool_names = await pool.list_tool_names(server_params)
+        candidates = await self._discover_candidates(session, tool_names, repo_owner, repo_name)
+        shas = {c["path"]: c.get("sha") for c in candidates}
+
+        if design_index.available():
+            # Retrieval picks sections per ticket, so every design doc is kept and no LLM selection is needed
+            selected = [c["path"] for c in candidates][:DESIGN_MAX_DOCS] or ["README.md"]
+        elif previous.get("selected") and sorted(shas) == sorted(c["path"] for c in previous.get("candidates", [])):
+            # The selection only depends on which files exist, so reuse it while the set is unchanged
+            selected = previous["selected"]
+        else:
+            selected = await self._select_files(candidates)
+
+        files = {}
+        to_fetch = []
+        for file_path in selected:
+            cached = previous.get("files", {}).get(file_path)
+            sha = shas.get(file_path)
+            if cached and sha and cached.get("sha") == sha:
+                files[file_path] = cached
+            else:
+                to_fetch.append(file_path)
+
+        # Changed files are fetched concurrently with a bounded fan-out
+        semaphore = asyncio.Semaphore(FILE_FETCH_CONCURRENCY)
+
+        async def fetch(file_path):
+            try:
+                async with semaphore:
+                    result = await session.call_tool("get_file_contents", arguments={"owner": repo_owner, "repo": repo_name, "path": file_path})
+                if result.content:
+                    content, file_sha = _decode_file_result(result.content[0].text)
+                    return file_path, {"sha": file_sha or shas.get(file_path), "content": content}
+            except Exception as e:
+                print(f"[{self.name}] Could not read {file_path}: {e}")
+            return file_path, None
+
+        refetched = []
+        for file_path, entry in await asyncio.gather(*[fetch(file_path) for file_path in to_fetch]):
+            if entry is not None:
+                files[file_path] = entry
+                refetched.append(file_path)
+            elif previous.get("files", {}).get(file_path):
+                files[file_path] = previous["files"][file_path]
+
+        snapshot = {
+            "candidates": candidates,
+            "selected": selected,
+            "files": files,
+            "refreshed_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if refetched or snapshot["selected"] != previous.get("selected") or not previous:
+            print(f"[{self.name}] Design-context snapshot updated ({len(refetched)} files refetched).")
+        self._save_snapshot(repo_owner, repo_name, snapshot)
+        return snapshot
+
+    def _schedule_revalidation(self, pool, server_params, repo_owner, repo_name, snapshot):
+        key = (repo_owner, repo_name)
+        if key in _revalidating:
+            return
+
+        async def revalidate():
+            try:
+                await self._refresh_snapshot(pool, server_params, repo_owner, repo_name, snapshot)
+            except Exception as e:
+                print(f"[{self.name}] Background revalidation failed: {e}")
+            finally:
+                _revalidating.discard(key)
+
+        _revalidating.add(key)
+        task = asyncio.create_task(revalidate())
+        # Keep a reference so the task is not garbage-collected mid-flight
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    def _snapshot_path(self, repo_owner, repo_name):
+        return os.path.join(SNAPSHOT_DIR, f"{repo_owner}__{repo_name}.json")
+
+    def _load_snapshot(self, repo_owner, repo_name):
+        try:
+            with open(self._snapshot_path(repo_owner, repo_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_snapshot(self, repo_owner, repo_name, snapshot):
+        path = self._snapshot_path(repo_owner, repo_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[{self.name}] Failed to save design snapshot: {e}")
+
+    def _context_from_snapshot(self, snapshot):
+        code_context = ""
+        for file_path in snapshot.get("selected", []):
+            entry = snapshot.get("files", {}).get(file_path)
+            if entry:
+                code_context += f"File: {file_path}\nContent:\n{entry['content'][:3000]}\n\n"
+        return code_context
+
+    def _model_and_prompt(self, prefix, cached_model, suffix):
+        # With a cached model the prefix already lives server-side; it still keys the response cache.
+        # Otherwise the router resolves the route's model on each call.
+        if cached_model is not None:
+            return cached_model, suffix, prefix
+        return None, prefix + suffix, ""
+
+    async def _analyze_ticket(self, ticket, prefix, cached_model, semaphore, report=None):
+        key = ticket.get('key')
+        model, prompt, key_prefix = self._model_and_prompt(prefix, cached_model, _ticket_suffix(ticket))
+
+        # Stream tokens only when someone is watching the run
+        on_chunk = None
+        if events.listening():
+            on_chunk = lambda text: events.emit("llm_token", site="ticket_analysis", ticket=key, text=text)
+
+        # A failing ticket is reported on its own and never aborts the batch
+        try:
+            async with semaphore:
+                analysis = await model_router.generate_async("ticket_analysis", prompt, model=model, key_prefix=key_prefix, on_chunk=on_chunk)
+        except Exception as e:
+            print(f"[{self.name}] Analysis failed for {key}: {e}")
+            if report is not None:
+                report(key, None, str(e))
+            return key, None, str(e)
+        if report is not None:
+            report(key, analysis, None)
+        return key, analysis, None
+
+    async def _analyze_batch(self, batch, prefix, cached_model, semaphore, report=None):
+        keys = [ticket.get('key') for ticket in batch]
+        if len(batch) == 1 or None in keys or len(set(keys)) != len(keys):
+            return await asyncio.gather(*[
+                self._analyze_ticket(ticket, prefix, cached_model, semaphore, report)
+                for ticket in batch
+            ])
+
+        model, prompt, key_prefix = self._model_and_prompt(prefix, cached_model, _batch_suffix(batch))
+
+        # The schema pins one string property per ticket key so the reply splits back cleanly
+        generation_config = {
+            "response_mime_type": "application/json",
+            "response_schema": {
+                "type": "object",
+                "properties": {key: {"type": "string"} for key in keys},
+                "required": keys,
+            },
+        }
+
+        results = {}
+        try:
+            async with semaphore:
+                text = await model_router.generate_async("batch_analysis", prompt, validate=json.loads, generation_config=generation_config, model=model, key_prefix=key_prefix)
+            parsed = json.loads(text)
+            if isinstance(parsed, dict):
+                for key in keys:
+                    analysis = parsed.get(key)
+                    if isinstance(analysis, str) and analysis.strip():
+                        results[key] = (key, analysis, None)
+                        if report is not None:
+                            report(key, analysis, None)
+        except Exception as e:
+            print(f"[{self.name}] Batch analysis failed for {keys}: {e}. Falling back to per-ticket calls.")
+
+        # Anything the batch reply did not cover is analyzed on its own
+        missing = [ticket for ticket in batch if ticket.get('key') not in results]
+        if missing:
+            if len(missing) < len(batch):
+                print(f"[{self.name}] Batch reply missing {[t.get('key') for t in missing]}. Falling back to per-ticket calls.")
+            fallback = await asyncio.gather(*[
+                self._analyze_ticket(ticket, prefix, cached_model, semaphore, report)
+                for ticket in missing
+            ])
+            for result in fallback:
+                results[result[0]] = result
+
+        return [results[key] for key in keys]
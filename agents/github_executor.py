@@ -1,8 +1,19 @@
 import os
 import json
+import asyncio
+from datetime import datetime, timezone
 from google.adk import Agent
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp_pool import github_server_params, get_shared_pool, is_error_result
+from issue_index import IssueIndex
+from ratelimit import rate_limit_error, call_with_backoff, github_content_bucket
+import events
+from routing import DEFAULT_REPO_OWNER, DEFAULT_REPO_NAME, repo_slug
+
+# GitHub's maximum page size for list endpoints
+ISSUE_PAGE_SIZE = 100
+# create_issue calls in flight. GitHub asks for content to be created serially, so
+# the default is one; throughput is bounded by the limits in ratelimit.py
+ISSUE_CREATE_CONCURRENCY = int(os.getenv("ISSUE_CREATE_CONCURRENCY", "1"))
 
 class GitHubExecutor(Agent):
     def __init__(self, name="GitHubExecutor"):
@@ -10,77 +21,141 @@ class GitHubExecutor(Agent):
         self.description = "Interacts with GitHub to list or create issues."
 
     async def run(self, context):
-        repo_owner = "akshay-mp"
-        repo_name = "simple_production_rag"
+        repo_owner = context.get("repo_owner") or DEFAULT_REPO_OWNER
+        repo_name = context.get("repo_name") or DEFAULT_REPO_NAME
+        slug = repo_slug(repo_owner, repo_name)
         action = context.get("action", "create_issues") 
         
         # Connect to GitHub MCP
-        env = os.environ.copy()
         # Ensure GitHub PAT is passed to the MCP server
-        if "GITHUB_PERSONAL_ACCESS_TOKEN" not in env:
+        if "GITHUB_PERSONAL_ACCESS_TOKEN" not in os.environ:
              print(f"[{self.name}] Warning: GITHUB_PERSONAL_ACCESS_TOKEN not found in environment.")
 
-        server_params = StdioServerParameters(
-            command="npx",
-            args=["-y", "@modelcontextprotocol/server-github"],
-            env=env
-        )
+        # Both actions share one warm session from the pool instead of spawning a server each.
+        server_params = github_server_params()
+        pool = context.get("mcp_pool") or get_shared_pool()
         
         if action == "list_issues":
-            print(f"[{self.name}] Listing issues from {repo_owner}/{repo_name}...")
-            existing_issues = []
+            # Issues live in a local index: the first sync pages through everything,
+            # later syncs only ask for issues updated since the previous one.
+            index = IssueIndex(repo_owner, repo_name)
+            since = index.last_sync()
+            print(f"[{self.name}] Syncing issues from {repo_owner}/{repo_name} ({'since ' + since if since else 'full sync'})...")
+            sync_started = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
             try:
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        list_result = await session.call_tool("list_issues", arguments={
-                            "owner": repo_owner, 
-                            "repo": repo_name,
-                            "state": "all"
-                        })
-                        if list_result.content:
-                            try:
-                                issues_data = json.loads(list_result.content[0].text)
-                                existing_issues = [{"title": issue.get('title', ''), "number": issue.get('number')} for issue in issues_data]
-                            except json.JSONDecodeError:
-                                print(f"[{self.name}] Could not parse list_issues output as JSON.")
+                session = await pool.get_session(server_params)
+                synced = 0
+                page = 1
+                while True:
+                    arguments = {
+                        "owner": repo_owner,
+                        "repo": repo_name,
+                        "state": "all",
+                        "per_page": ISSUE_PAGE_SIZE,
+                        "page": page
+                    }
+                    if since:
+                        arguments["since"] = since
+                    list_result = await session.call_tool("list_issues", arguments=arguments)
+                    if not list_result.content:
+                        break
+                    try:
+                        issues_data = json.loads(list_result.content[0].text)
+                    except json.JSONDecodeError:
+                        # Leave the watermark alone so the next run retries this window
+                        raise ValueError("Could not parse list_issues output as JSON.")
+                    if not isinstance(issues_data, list) or not issues_data:
+                        break
+                    synced += index.upsert_issues(issues_data)
+                    if len(issues_data) < ISSUE_PAGE_SIZE:
+                        break
+                    page += 1
+                # Only advance the watermark after a complete pass
+                index.set_last_sync(sync_started)
+                print(f"[{self.name}] Synced {synced} issues ({index.count()} indexed).")
             except Exception as e:
                 print(f"[{self.name}] Failed to list issues: {e}")
-            return {"existing_issues": existing_issues}
+            return {"existing_issues": index.list_issues(), "issue_index": index.path}
 
         elif action == "create_issues":
             analysis_list = context.get("impact_analysis", [])
             print(f"[{self.name}] Creating issues in {repo_owner}/{repo_name} for {len(analysis_list)} items...")
-            created_issues = []
             
+            # Issues created before a resumed run's failure are never created twice
+            checkpoint = context.get("checkpoint")
+            done = checkpoint.created_issues(slug) if checkpoint else {}
+
+            index = IssueIndex(repo_owner, repo_name)
             try:
-                async with stdio_client(server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        
-                        for item in analysis_list:
-                            ticket = item['ticket']
-                            analysis = item['analysis']
-                            
-                            title = f"Implement changes for {ticket}"
-                            body = f"**Impact Analysis**\n\n{analysis}\n\nRef: {ticket}"
-                            
-                            try:
-                                await session.call_tool("create_issue", arguments={
-                                    "owner": repo_owner, 
-                                    "repo": repo_name, 
-                                    "title": title, 
-                                    "body": body
-                                })
-                                created_issues.append(f"Created issue for {ticket} in {repo_owner}/{repo_name}")
-                            except Exception as e:
-                                print(f"[{self.name}] Failed to create issue for {ticket}: {e}")
-                                created_issues.append(f"Failed to create issue for {ticket}")
-                                
+                session = await pool.get_session(server_params)
             except Exception as e:
                 print(f"[{self.name}] Error updating GitHub: {e}")
-                created_issues.append("Error connecting to GitHub")
-                        
+                return {"created_issues": [
+                    done.get(item['ticket']) if (done.get(item['ticket']) or {}).get("status") == "created" else
+                    {"ticket": item['ticket'], "repo": slug, "status": "failed", "number": None, "url": None, "error": f"Error connecting to GitHub: {e}"}
+                    for item in analysis_list
+                ]}
+
+            # Issues are created concurrently; the shared token bucket paces them to
+            # GitHub's content-creation limits and rate-limit errors are retried.
+            concurrency = int(context.get("issue_create_concurrency") or ISSUE_CREATE_CONCURRENCY)
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+            async def create(item):
+                previous = done.get(item['ticket'])
+                if previous and previous.get("status") == "created":
+                    return previous
+                outcome = await self._create_issue(session, index, repo_owner, repo_name, item, semaphore)
+                if checkpoint is not None:
+                    checkpoint.record_issue(item['ticket'], outcome, slug)
+                return outcome
+
+            created_issues = await asyncio.gather(*[create(item) for item in analysis_list])
             return {"created_issues": created_issues}
         
         return {}
+
+    async def _create_issue(self, session, index, repo_owner, repo_name, item, semaphore):
+        ticket = item['ticket']
+        analysis = item['analysis']
+
+        title = f"Implement changes for {ticket}"
+        body = f"**Impact Analysis**\n\n{analysis}\n\nRef: {ticket}"
+
+        async def call():
+            try:
+                result = await session.call_tool("create_issue", arguments={
+                    "owner": repo_owner,
+                    "repo": repo_name,
+                    "title": title,
+                    "body": body
+                })
+            except Exception as e:
+                # Rate-limit failures may also surface as protocol errors
+                error = rate_limit_error(str(e))
+                if error is None:
+                    raise
+                raise error from e
+            text = result.content[0].text if result.content else ""
+            if is_error_result(result):
+                raise rate_limit_error(text) or RuntimeError(text or "create_issue failed")
+            return text
+
+        outcome = {"ticket": ticket, "repo": repo_slug(repo_owner, repo_name), "status": "created", "number": None, "url": None, "error": None}
+        try:
+            async with semaphore:
+                text = await call_with_backoff(call, github_content_bucket())
+            try:
+                issue = json.loads(text)
+            except json.JSONDecodeError:
+                issue = None
+            if isinstance(issue, dict):
+                outcome["number"] = issue.get("number")
+                outcome["url"] = issue.get("html_url")
+                # Index the new issue right away so the next run sees it before re-syncing
+                index.upsert_issues([issue])
+            print(f"[{self.name}] Created issue #{outcome['number']} for {ticket}")
+        except Exception as e:
+            print(f"[{self.name}] Failed to create issue for {ticket}: {e}")
+            outcome.update(status="failed", error=str(e))
+        events.emit("issue_created", **outcome)
+        return outcome
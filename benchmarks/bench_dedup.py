@@ -0,0 +1,113 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DuplicateDetector
+
+# Synthetic benchmark for the duplicate detection engine: builds the exact and
+# MinHash/LSH indexes over N issues and times exact and near-duplicate lookups
+# against the nested-loop substring scan the orchestrator used before. It also times
+# the incremental update a re-sync triggers when --changed issues were edited.
+
+VOCAB = [
+    "auth", "login", "token", "refresh", "cache", "retriever", "embedding", "index", "vector",
+    "store", "chunk", "prompt", "rerank", "latency", "timeout", "retry", "queue", "worker",
+    "upload", "pdf", "parser", "metadata", "filter", "search", "api", "endpoint", "schema",
+    "migration", "database", "logging", "metrics", "dashboard", "alert", "deploy", "docker",
+    "config", "secret", "rotation", "session", "user", "admin", "role", "permission", "export",
+    "import", "report", "billing", "invoice", "webhook", "notification", "email", "sms",
+]
+
+
+def make_title(rng):
+    return " ".join(rng.choice(VOCAB) for _ in range(rng.randint(4, 8)))
+
+
+def naive_lookup(key, titles):
+    for title in titles:
+        if key in title:
+            return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--issues", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--changed", type=int, default=100, help="issues edited between two syncs")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    issues = []
+    for number in range(1, args.issues + 1):
+        topic = make_title(rng)
+        issues.append({
+            "number": number,
+            "title": f"Implement changes for KAN-{number}",
+            "body": f"{topic}\n\n**Impact Analysis**\n\n...\n\nRef: KAN-{number}",
+            "topic": topic,
+        })
+
+    start = time.perf_counter()
+    detector = DuplicateDetector.from_issues(issues)
+    build_seconds = time.perf_counter() - start
+
+    # Half the queries hit an existing key, half are new keys whose summary
+    # restates an existing issue's topic (near-duplicates under a different key).
+    queries = []
+    for i in range(args.queries):
+        source = rng.choice(issues)
+        if i % 2 == 0:
+            queries.append(({"key": f"KAN-{source['number']}", "fields": {"summary": make_title(rng)}}, "exact"))
+        else:
+            queries.append(({"key": f"NEW-{i}", "fields": {"summary": source["topic"]}}, source["number"]))
+
+    start = time.perf_counter()
+    exact_hits = 0
+    near_hits = 0
+    for ticket, expected in queries:
+        result = detector.check_ticket(ticket)
+        if expected == "exact":
+            exact_hits += bool(result["exact"])
+        elif any(match["number"] == expected for match in result["near"]):
+            near_hits += 1
+    query_seconds = time.perf_counter() - start
+
+    # What detector_for_index does after a sync that edited some issues
+    changed = rng.sample(issues, min(args.changed, len(issues)))
+    start = time.perf_counter()
+    for issue in changed:
+        detector.add_issue(issue["number"], issue["title"], f"{make_title(rng)}\n\nRef: KAN-{issue['number']}")
+    update_seconds = time.perf_counter() - start
+
+    # The old nested loop, sampled because it is O(tickets x issues)
+    titles = [issue["title"] for issue in issues]
+    sample = [ticket for ticket, _ in queries[:50]]
+    start = time.perf_counter()
+    for ticket in sample:
+        naive_lookup(ticket["key"], titles)
+    naive_per_query = (time.perf_counter() - start) / len(sample)
+
+    report = {
+        "issues": args.issues,
+        "queries": args.queries,
+        "build_seconds": round(build_seconds, 3),
+        "changed": len(changed),
+        "update_seconds": round(update_seconds, 4),
+        "per_query_ms": round(query_seconds / args.queries * 1000, 4),
+        "naive_per_query_ms": round(naive_per_query * 1000, 4),
+        "exact_recall": round(exact_hits / max(1, args.queries // 2 + args.queries % 2), 4),
+        "near_recall": round(near_hits / max(1, args.queries // 2), 4),
+        "buckets": len(detector.buckets),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+import contextvars
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Offline end-to-end benchmark: the real orchestrator, registry, agents and MCP pool
+# run against the stand-in servers in stub_mcp_server.py and the fake Gemini model in
+# fake_llm.py, so no Atlassian, GitHub or Gemini credentials are needed.
+#
+#   python benchmarks/bench_e2e.py                       run 10 / 1k / 10k tickets, print JSON
+#   python benchmarks/bench_e2e.py --update-baseline     write benchmarks/baseline_e2e.json
+#   python benchmarks/bench_e2e.py --check               exit 1 if a scenario regressed
+#
+# Each scenario runs in its own process and data directory, so caches, checkpoints and
+# peak RSS never leak between scenarios. Reported per scenario: wall time, per-stage
+# wall time with p50/p95 of every MCP tool and LLM call made in the stage, peak RSS
+# of the orchestrator process and MCP/LLM calls per ticket. The GitHub create-rate
+# limiter is lifted: the benchmark measures the pipeline, not the configured quota.
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline_e2e.json")
+STUB_SERVER = os.path.join(ROOT, "benchmarks", "stub_mcp_server.py")
+DEFAULT_SCENARIOS = "10,1000,10000"
+# Scenario metrics that must not grow by more than the tolerance; timings below
+# TIME_FLOOR_SECONDS are too noisy to compare in relative terms.
+TIME_FLOOR_SECONDS = 0.25
+
+_stage = contextvars.ContextVar("bench_stage", default="planning")
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def scenario_env(args, tickets):
+    env = os.environ.copy()
+    existing = int(tickets * args.existing_fraction)
+    python = sys.executable
+    env.update({
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "ATLASSIAN_MCP_COMMAND": f'"{python}" "{STUB_SERVER}" jira --tickets {tickets} --latency-ms {args.mcp_latency_ms}',
+        "GITHUB_MCP_COMMAND": f'"{python}" "{STUB_SERVER}" github --existing {existing} --latency-ms {args.mcp_latency_ms}',
+        "ATLASSIAN_EMAIL": "bench@example.com", "ATLASSIAN_TOKEN": "bench", "ATLASSIAN_BASE_URL": "https://bench.atlassian.net",
+        "GITHUB_PERSONAL_ACCESS_TOKEN": "bench", "GOOGLE_API_KEY": "bench",
+        "GITHUB_REPO_OWNER": "bench", "GITHUB_REPO_NAME": "repo",
+        "LLM_CACHE_DISABLED": "1",
+        "CONTEXT_CACHE_BACKEND": "inprocess",
+        "GITHUB_CREATE_PER_MINUTE": "1000000000", "GITHUB_CREATE_BURST": "1000000000",
+        "GITHUB_CREATE_PER_HOUR": "1000000000", "GITHUB_CREATE_MIN_INTERVAL": "0", "ISSUE_CREATE_CONCURRENCY": "4",
+    })
+    return env
+
+
+def run_scenario(args, tickets):
+    workdir = tempfile.mkdtemp(prefix=f"bench_e2e_{tickets}_")
+    out_path = os.path.join(workdir, "result.json")
+    try:
+        # Relative paths (manifests/, data/) resolve inside the scenario's own directory
+        shutil.copytree(os.path.join(ROOT, "manifests"), os.path.join(workdir, "manifests"))
+        command = [sys.executable, os.path.abspath(__file__), "--worker", str(tickets), "--out", out_path,
+                   "--llm-latency-ms", str(args.llm_latency_ms), "--llm-tokens", str(args.llm_tokens),
+                   "--llm-token-ms", str(args.llm_token_ms)]
+        result = subprocess.run(
+            command, cwd=workdir, env=scenario_env(args, tickets),
+            stdout=None if args.verbose else subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        if result.returncode != 0 or not os.path.exists(out_path):
+            raise RuntimeError(f"Scenario with {tickets} tickets failed:\n{result.stderr[-3000:]}")
+        with open(out_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def _worker_run(tickets):
+    from mcp_pool import get_shared_pool
+    from orchestrator import ChangeManagementOrchestrator
+    orchestrator = ChangeManagementOrchestrator()
+    try:
+        return await orchestrator.run({})
+    finally:
+        await get_shared_pool().close()
+
+
+def worker(args):
+    samples = {}
+    stage_seconds = {}
+
+    def record(operation, seconds):
+        samples.setdefault(_stage.get(), {}).setdefault(operation, []).append(seconds)
+
+    import fake_llm
+    fake_llm.install(args.llm_latency_ms, args.llm_tokens, args.llm_token_ms, recorder=record)
+
+    # Every MCP tool call is timed client-side, attributed to the plan step it runs in
+    from mcp import ClientSession
+    call_tool = ClientSession.call_tool
+
+    async def timed_call_tool(self, name, *call_args, **call_kwargs):
+        started = time.perf_counter()
+        try:
+            return await call_tool(self, name, *call_args, **call_kwargs)
+        finally:
+            record(name, time.perf_counter() - started)
+
+    ClientSession.call_tool = timed_call_tool
+
+    from orchestrator import ChangeManagementOrchestrator
+    run_step = ChangeManagementOrchestrator._run_step
+
+    async def timed_run_step(self, step, registry, context):
+        capability = step.get("capability")
+        _stage.set(capability)
+        started = time.perf_counter()
+        try:
+            return await run_step(self, step, registry, context)
+        finally:
+            stage_seconds[capability] = time.perf_counter() - started
+
+    ChangeManagementOrchestrator._run_step = timed_run_step
+
+    started = time.perf_counter()
+    context = asyncio.run(_worker_run(args.worker))
+    wall = time.perf_counter() - started
+
+    created = context.get("created_issues", [])
+    stages = {}
+    mcp_calls = llm_calls = 0
+    for stage in list(stage_seconds) + [s for s in samples if s not in stage_seconds]:
+        operations = {}
+        for operation, values in sorted(samples.get(stage, {}).items()):
+            operations[operation] = {
+                "calls": len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            }
+            if operation == "generate_content":
+                llm_calls += len(values)
+            else:
+                mcp_calls += len(values)
+        stages[stage] = {"seconds": round(stage_seconds[stage], 4) if stage in stage_seconds else None, "operations": operations}
+
+    report = {
+        "tickets": args.worker,
+        "wall_seconds": round(wall, 4),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        "mcp_calls_per_ticket": round(mcp_calls / max(1, args.worker), 4),
+        "llm_calls_per_ticket": round(llm_calls / max(1, args.worker), 4),
+        "analyzed": len(context.get("design_analysis", [])),
+        "analysis_errors": len(context.get("analysis_errors", [])),
+        "issues_created": sum(1 for issue in created if issue.get("status") == "created"),
+        "issues_failed": sum(1 for issue in created if issue.get("status") != "created"),
+        "stages": stages,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return 0
+
+
+def compare(baseline, current, tolerance, rss_tolerance):
+    # Lists every metric of every scenario that grew past its allowance
+    failures = []
+
+    def check(label, base, value, allowed):
+        if base is not None and value is not None and value > allowed:
+            failures.append(f"{label}: {value} > {round(allowed, 4)} (baseline {base})")
+
+    for tickets, base in baseline.get("scenarios", {}).items():
+        result = current.get("scenarios", {}).get(tickets)
+        if result is None:
+            continue
+        prefix = f"{tickets} tickets"
+        check(f"{prefix} wall_seconds", base["wall_seconds"], result["wall_seconds"],
+              max(base["wall_seconds"] * (1 + tolerance), base["wall_seconds"] + TIME_FLOOR_SECONDS))
+        check(f"{prefix} peak_rss_mb", base["peak_rss_mb"], result["peak_rss_mb"], base["peak_rss_mb"] * (1 + rss_tolerance))
+        # Call counts are deterministic: any increase is a regression
+        for metric in ("mcp_calls_per_ticket", "llm_calls_per_ticket"):
+            check(f"{prefix} {metric}", base[metric], result[metric], base[metric] + 1e-6)
+        check(f"{prefix} issues_failed", base["issues_failed"], result["issues_failed"], base["issues_failed"])
+        for stage, stage_base in base.get("stages", {}).items():
+            stage_result = result.get("stages", {}).get(stage)
+            if stage_result is None:
+                failures.append(f"{prefix} stage {stage} is missing")
+                continue
+            if stage_base.get("seconds") is not None:
+                check(f"{prefix} {stage} seconds", stage_base["seconds"], stage_result.get("seconds"),
+                      max(stage_base["seconds"] * (1 + tolerance), stage_base["seconds"] + TIME_FLOOR_SECONDS))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with stand-in MCP servers and a fake LLM.")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="comma-separated ticket counts")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0, help="fake Gemini time to first token")
+    parser.add_argument("--llm-tokens", type=int, default=150, help="fake Gemini reply length in tokens")
+    parser.add_argument("--llm-token-ms", type=float, default=0.0, help="fake Gemini time per output token")
+    parser.add_argument("--mcp-latency-ms", type=float, default=2.0, help="stub MCP server time per tool call")
+    parser.add_argument("--existing-fraction", type=float, default=0.1, help="share of tickets that already have a GitHub issue")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="compare against the baseline and exit 1 on regression")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown before --check fails")
+    parser.add_argument("--rss-tolerance", type=float, default=0.25, help="allowed relative peak-RSS growth")
+    parser.add_argument("--verbose", action="store_true", help="show the orchestrator's output")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        return worker(args)
+
+    config = {
+        "llm_latency_ms": args.llm_latency_ms, "llm_tokens": args.llm_tokens, "llm_token_ms": args.llm_token_ms,
+        "mcp_latency_ms": args.mcp_latency_ms, "existing_fraction": args.existing_fraction,
+    }
+    results = {"config": config, "scenarios": {}}
+    for tickets in [int(n) for n in args.scenarios.split(",") if n.strip()]:
+        print(f"Running scenario with {tickets} tickets...", file=sys.stderr)
+        results["scenarios"][str(tickets)] = run_scenario(args, tickets)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+
+    if args.check:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}", file=sys.stderr)
+        failures = compare(baseline, results, args.tolerance, args.rss_tolerance)
+        for failure in failures:
+            print(f"REGRESSION: {failure}", file=sys.stderr)
+        if failures:
+            return 1
+        print("No regressions against the baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import re
+import json
+import time
+import asyncio
+
+# A stand-in for google.generativeai.GenerativeModel with a configurable latency and
+# reply size, for offline benchmarks. install() swaps it in for genai.GenerativeModel,
+# so every model the agents and the planner create afterwards is fake. Replies are
+# shaped like the real ones each call site expects: a plan for the planner, a file
+# list for design-doc selection, a JSON object per ticket key for batched analysis,
+# and analysis text otherwise.
+
+JSON_LIST_RE = re.compile(r"\[[^\[\]]*\]")
+
+
+class _Usage:
+    def __init__(self, prompt, text):
+        # Roughly four characters per token, like the repo's own estimates
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+        self.cached_content_token_count = 0
+
+
+class _Response:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class _Stream:
+    def __init__(self, chunks, delay, usage):
+        self._chunks = chunks
+        self._delay = delay
+        self._usage = usage
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i, chunk in enumerate(self._chunks):
+            await asyncio.sleep(self._delay)
+            # Like Gemini, the usage totals arrive with the last chunk
+            yield _Response(chunk, self._usage if i == len(self._chunks) - 1 else None)
+
+
+class FakeGenerativeModel:
+    def __init__(self, model_name="gemini-2.5-flash", latency_ms=200.0, tokens=150, token_ms=0.0, recorder=None, **kwargs):
+        self.model_name = model_name
+        self.latency = latency_ms / 1000.0
+        self.tokens = tokens
+        self.token_delay = token_ms / 1000.0
+        self.recorder = recorder
+        self.calls = 0
+
+    def _analysis(self, seed):
+        words = ["component", "retriever", "index", "service", "schema", "cache", "api", "worker"]
+        body = " ".join(words[(seed + i) % len(words)] for i in range(max(0, self.tokens - 12)))
+        return f"**Current Design**: {body}\n**Components to Change**: retriever, api\n**Components to Redesign/Create**: cache"
+
+    def _reply(self, prompt, generation_config):
+        schema = (generation_config or {}).get("response_schema") or {}
+        if schema.get("properties"):
+            return json.dumps({key: self._analysis(i) for i, key in enumerate(schema["properties"])})
+        if "execution plan" in prompt:
+            from planning import FALLBACK_PLAN
+            return json.dumps(FALLBACK_PLAN)
+        if "selected file paths" in prompt:
+            match = JSON_LIST_RE.search(prompt)
+            return json.dumps(json.loads(match.group(0))[:3] if match else [])
+        return self._analysis(len(prompt))
+
+    def _delay(self):
+        return self.latency + self.tokens * self.token_delay
+
+    def _record(self, started):
+        self.calls += 1
+        if self.recorder is not None:
+            self.recorder("generate_content", time.perf_counter() - started)
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        started = time.perf_counter()
+        time.sleep(self._delay())
+        text = self._reply(prompt, generation_config)
+        self._record(started)
+        return _Response(text, _Usage(prompt, text))
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, **kwargs):
+        started = time.perf_counter()
+        text = self._reply(prompt, generation_config)
+        if stream:
+            # Time to first token, then the rest in ~8-token chunks
+            await asyncio.sleep(self.latency)
+            words = text.split(" ")
+            chunks = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+            self._record(started)
+            return _Stream(chunks, self.token_delay * 8, _Usage(prompt, text))
+        await asyncio.sleep(self._delay())
+        self._record(started)
+        return _Response(text, _Usage(prompt, text))
+
+
+def install(latency_ms=200.0, tokens=150, token_ms=0.0, recorder=None):
+    # Every genai.GenerativeModel(...) created from now on is a FakeGenerativeModel
+    import google.generativeai as genai
+
+    def factory(model_name="gemini-2.5-flash", **kwargs):
+        return FakeGenerativeModel(model_name, latency_ms, tokens, token_ms, recorder)
+
+    genai.GenerativeModel = factory
+    genai.configure = lambda **kwargs: None
+    return factory
@@ -0,0 +1,261 @@
+import os
+import re
+import sys
+import json
+import base64
+import random
+import asyncio
+import argparse
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import mcp.types as types
+from mcp.server.lowlevel import Server
+from mcp.server.stdio import stdio_server
+
+# Stand-in MCP stdio servers for offline benchmarks. They serve the tools the agents
+# call from generated, deterministic data:
+#   jira    getAccessibleAtlassianResources, searchJiraIssuesUsingJql (paginated, with
+#           the created/updated range filters and ORDER BY the collector's partitions use).
+#           Every tool in the checked-in tools.json is listed with its real schema.
+#   github  list_issues, create_issue, get_file_contents, list_directory over an
+#           in-memory issue tracker and a small repository of design docs.
+# Usage: python benchmarks/stub_mcp_server.py {jira,github} [--tickets N] [--existing N] [--latency-ms MS]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS_FILE = os.path.join(ROOT, "tools.json")
+TOOL_HEADER_RE = re.compile(r"^--- Tool: (\S+) ---$")
+RANGE_RE = re.compile(r'(created|updated)\s*(<=|>=|<|>)\s*"([^"]+)"')
+ORDER_RE = re.compile(r"ORDER BY\s+(\w+)\s+(ASC|DESC)", re.IGNORECASE)
+
+CLOUD_ID = "00000000-bench-0000-0000-000000000000"
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+PROJECT = "KAN"
+OWNER_DEFAULT = "bench"
+
+WORDS = [
+    "auth", "login", "token", "refresh", "cache", "retriever", "embedding", "index", "vector",
+    "store", "chunk", "prompt", "rerank", "latency", "timeout", "retry", "migration", "database",
+    "logging", "metrics", "dashboard", "alert", "deploy", "config", "secret", "session", "export",
+]
+
+GITHUB_TOOLS = [
+    {"name": "list_issues", "description": "List issues in a GitHub repository", "inputSchema": {
+        "type": "object", "required": ["owner", "repo"], "properties": {
+            "owner": {"type": "string"}, "repo": {"type": "string"}, "state": {"type": "string"},
+            "since": {"type": "string"}, "page": {"type": "number"}, "per_page": {"type": "number"}}}},
+    {"name": "create_issue", "description": "Create a new issue in a GitHub repository", "inputSchema": {
+        "type": "object", "required": ["owner", "repo", "title"], "properties": {
+            "owner": {"type": "string"}, "repo": {"type": "string"}, "title": {"type": "string"},
+            "body": {"type": "string"}}}},
+    {"name": "get_file_contents", "description": "Get the contents of a file or directory", "inputSchema": {
+        "type": "object", "required": ["owner", "repo", "path"], "properties": {
+            "owner": {"type": "string"}, "repo": {"type": "string"}, "path": {"type": "string"},
+            "branch": {"type": "string"}}}},
+    {"name": "list_directory", "description": "List the entries of a repository directory", "inputSchema": {
+        "type": "object", "required": ["owner", "repo"], "properties": {
+            "owner": {"type": "string"}, "repo": {"type": "string"}, "path": {"type": "string"}}}},
+]
+
+REPO_FILES = {
+    "README.md": "Simple production RAG service",
+    "docs/architecture.md": "Architecture overview",
+    "docs/design/components.puml": "Component diagram",
+    "docs/design/data-flow.md": "Ingestion and query data flow",
+    "docs/operations.md": "Deployment and operations",
+    "src/app.py": None,
+    "src/retriever.py": None,
+}
+
+
+def jira_time(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}" + value.strftime("%z")
+
+
+def load_atlassian_tools(path=TOOLS_FILE):
+    # tools.json is a captured `list_tools` dump (UTF-16): "--- Tool: name ---" headers followed by JSON
+    with open(path, "r", encoding="utf-16") as f:
+        lines = f.read().splitlines()
+    tools, block = [], None
+    for line in lines + ["--- Tool: end ---"]:
+        if TOOL_HEADER_RE.match(line):
+            if block:
+                tools.append(json.loads("\n".join(block)))
+            block = []
+        elif block is not None:
+            block.append(line)
+    return tools
+
+
+def make_tickets(count, seed=7):
+    rng = random.Random(seed)
+    tickets = []
+    for number in range(1, count + 1):
+        # One ticket every 90 seconds, so date-range partitions have something to split
+        created = EPOCH + timedelta(seconds=90 * number)
+        topic = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 8)))
+        tickets.append({
+            "id": str(10000 + number),
+            "key": f"{PROJECT}-{number}",
+            "fields": {
+                "summary": f"Improve {topic}",
+                "description": f"As a user I need the {topic} flow to handle more load. " * 3,
+                "status": {"name": "To Do"},
+                "issuetype": {"name": "Story"},
+                "priority": {"name": rng.choice(["Low", "Medium", "High"])},
+                "created": jira_time(created),
+                "updated": jira_time(created + timedelta(seconds=30)),
+                "components": [],
+                "project": {"key": PROJECT},
+            },
+        })
+    return tickets
+
+
+def make_doc(path, title):
+    lines = [f"# {title}", ""]
+    rng = random.Random(path)
+    for section in range(6):
+        lines.append(f"## {rng.choice(WORDS).title()} {section + 1}")
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(60)))
+        lines.append("")
+    return "\n".join(lines)
+
+
+class StubServer:
+    def __init__(self, kind, tickets=1000, existing=0, latency_ms=0.0):
+        self.kind = kind
+        self.latency = latency_ms / 1000.0
+        if kind == "jira":
+            self.tools = load_atlassian_tools()
+            self.tickets = make_tickets(tickets)
+            # Parsed once: range filters compare datetimes on every search call
+            self.times = {t["key"]: {field: datetime.strptime(t["fields"][field], "%Y-%m-%dT%H:%M:%S.%f%z")
+                                     for field in ("created", "updated")} for t in self.tickets}
+        else:
+            self.tools = GITHUB_TOOLS
+            self.issues = []
+            for number in range(1, existing + 1):
+                self._add_issue(f"Implement changes for {PROJECT}-{number}", f"Ref: {PROJECT}-{number}",
+                                EPOCH + timedelta(seconds=90 * number))
+            self.files = {}
+            for path, title in REPO_FILES.items():
+                content = make_doc(path, title) if title else f"# {path}\n\ndef main():\n    pass\n"
+                self.files[path] = {"content": content, "sha": hashlib.sha1(content.encode()).hexdigest()}
+
+    # Jira
+
+    def getAccessibleAtlassianResources(self, arguments):
+        return [{"id": CLOUD_ID, "url": "https://bench.atlassian.net", "name": "bench", "scopes": []}]
+
+    def searchJiraIssuesUsingJql(self, arguments):
+        jql = arguments.get("jql", "")
+        selected = self.tickets
+        for field, op, value in RANGE_RE.findall(jql):
+            bound = datetime.strptime(value, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
+            compare = {"<": lambda t: t < bound, "<=": lambda t: t <= bound,
+                       ">": lambda t: t > bound, ">=": lambda t: t >= bound}[op]
+            selected = [t for t in selected if compare(self.times[t["key"]][field])]
+        order = ORDER_RE.search(jql)
+        if order:
+            field, direction = order.group(1).lower(), order.group(2).upper()
+            selected = sorted(selected, key=lambda t: t["fields"].get(field, ""), reverse=direction == "DESC")
+
+        start = int(arguments.get("nextPageToken") or 0)
+        size = min(int(arguments.get("maxResults") or 50), 100)
+        page = selected[start:start + size]
+        wanted = set(arguments.get("fields") or [])
+        if wanted:
+            page = [dict(t, fields={k: v for k, v in t["fields"].items() if k in wanted}) for t in page]
+        is_last = start + size >= len(selected)
+        reply = {"issues": page, "isLast": is_last}
+        if not is_last:
+            reply["nextPageToken"] = str(start + size)
+        return reply
+
+    # GitHub
+
+    def _add_issue(self, title, body, updated, owner=OWNER_DEFAULT, repo="repo"):
+        number = len(self.issues) + 1
+        issue = {
+            "number": number, "title": title, "body": body, "state": "open",
+            "html_url": f"https://github.com/{owner}/{repo}/issues/{number}",
+            "updated_at": updated.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        self.issues.append(issue)
+        return issue
+
+    def list_issues(self, arguments):
+        selected = self.issues
+        if arguments.get("since"):
+            since = datetime.strptime(arguments["since"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+            selected = [i for i in selected if datetime.strptime(i["updated_at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc) >= since]
+        selected = list(reversed(selected))
+        per_page = int(arguments.get("per_page") or 30)
+        page = int(arguments.get("page") or 1)
+        return selected[(page - 1) * per_page:page * per_page]
+
+    def create_issue(self, arguments):
+        return self._add_issue(arguments.get("title", ""), arguments.get("body", ""), datetime.now(timezone.utc),
+                               arguments.get("owner", OWNER_DEFAULT), arguments.get("repo", "repo"))
+
+    def _listing(self, path):
+        prefix = f"{path.strip('/')}/" if path.strip("/") else ""
+        entries = {}
+        for file_path, entry in self.files.items():
+            if not file_path.startswith(prefix):
+                continue
+            rest = file_path[len(prefix):]
+            name = rest.split("/", 1)[0]
+            if "/" in rest:
+                entries[name] = {"type": "dir", "name": name, "path": prefix + name}
+            else:
+                entries[name] = {"type": "file", "name": name, "path": file_path, "sha": entry["sha"]}
+        return sorted(entries.values(), key=lambda e: e["path"])
+
+    def get_file_contents(self, arguments):
+        path = (arguments.get("path") or "").strip("/")
+        entry = self.files.get(path)
+        if entry is None:
+            return self._listing(path)
+        return {"type": "file", "path": path, "sha": entry["sha"], "encoding": "base64",
+                "content": base64.b64encode(entry["content"].encode()).decode()}
+
+    def list_directory(self, arguments):
+        return self._listing(arguments.get("path") or "")
+
+    async def call(self, name, arguments):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        handler = getattr(self, name, None) if name in {t["name"] for t in self.tools} else None
+        if handler is None:
+            return types.CallToolResult(content=[types.TextContent(type="text", text=f"{name} is not implemented by the stub server")], is_error=True)
+        return types.CallToolResult(content=[types.TextContent(type="text", text=json.dumps(handler(arguments or {})))])
+
+
+async def serve(stub):
+    tools = [types.Tool(name=t["name"], description=t.get("description"), input_schema=t["inputSchema"]) for t in stub.tools]
+
+    async def on_list_tools(ctx, params):
+        return types.ListToolsResult(tools=tools)
+
+    async def on_call_tool(ctx, params):
+        return await stub.call(params.name, params.arguments)
+
+    server = Server(f"stub-{stub.kind}", on_list_tools=on_list_tools, on_call_tool=on_call_tool)
+    async with stdio_server() as (read, write):
+        await server.run(read, write, server.create_initialization_options())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in MCP server for offline benchmarks.")
+    parser.add_argument("kind", choices=["jira", "github"])
+    parser.add_argument("--tickets", type=int, default=1000, help="open Jira tickets to serve")
+    parser.add_argument("--existing", type=int, default=0, help="GitHub issues that already exist for the first N tickets")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every tool call")
+    args = parser.parse_args()
+    asyncio.run(serve(StubServer(args.kind, args.tickets, args.existing, args.latency_ms)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
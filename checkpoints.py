@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import uuid
+
+# Per-run checkpoints so a failed run can be resumed instead of redone.
+#   data/runs/<run_id>/state.json   plan, finished step indices and the run context,
+#                                   rewritten atomically after every successful step
+#   data/runs/<run_id>/items.jsonl  one line per analyzed ticket / created issue,
+#                                   appended as each item finishes
+# On resume, finished steps are skipped with their outputs restored, and the
+# analysis and issue-creation steps only process the tickets not in items.jsonl.
+
+RUNS_DIR = os.getenv("ORCHESTRATOR_RUNS_DIR", os.path.join("data", "runs"))
+# Context keys that are live objects or per-run bookkeeping, never persisted
+TRANSIENT_KEYS = {"mcp_pool", "checkpoint", "llm_cache_stats"}
+
+
+def new_run_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+class Checkpoint:
+    def __init__(self, run_id, directory=RUNS_DIR):
+        self.run_id = run_id
+        self.directory = os.path.join(directory, run_id)
+        self.state = {"run_id": run_id, "created_at": time.time(), "status": "running",
+                      "plan": None, "fingerprint": None, "completed_steps": [], "context": {}}
+        self._analyses = {}
+        self._issues = {}
+
+    @classmethod
+    def create(cls, directory=RUNS_DIR):
+        checkpoint = cls(new_run_id(), directory)
+        os.makedirs(checkpoint.directory, exist_ok=True)
+        return checkpoint
+
+    @classmethod
+    def load(cls, run_id, directory=RUNS_DIR):
+        checkpoint = cls(run_id, directory)
+        state_path = os.path.join(checkpoint.directory, "state.json")
+        if not os.path.exists(state_path):
+            raise FileNotFoundError(f"No checkpoint for run {run_id}")
+        with open(state_path, "r", encoding="utf-8") as f:
+            checkpoint.state = json.load(f)
+        try:
+            with open(os.path.join(checkpoint.directory, "items.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write; that item is simply redone
+                        continue
+                    if item.get("kind") == "analysis":
+                        checkpoint._analyses[(item.get("repo"), item["ticket"])] = item["analysis"]
+                    elif item.get("kind") == "issue":
+                        checkpoint._issues[(item.get("repo"), item["ticket"])] = item["outcome"]
+        except OSError:
+            pass
+        return checkpoint
+
+    @property
+    def plan(self):
+        return self.state.get("plan")
+
+    @property
+    def completed_steps(self):
+        return set(self.state.get("completed_steps", []))
+
+    def context(self):
+        return dict(self.state.get("context", {}))
+
+    @property
+    def deduplicated(self):
+        return bool(self.state.get("deduplicated"))
+
+    def mark_deduplicated(self):
+        # Persisted with the filtered context by the next step_done
+        self.state["deduplicated"] = True
+
+    def start(self, plan, fingerprint):
+        self.state["plan"] = plan
+        self.state["fingerprint"] = fingerprint
+        self.state["status"] = "running"
+        self._save()
+
+    def step_done(self, index, context):
+        if index not in self.state["completed_steps"]:
+            self.state["completed_steps"].append(index)
+        self.state["context"] = {k: v for k, v in context.items() if k not in TRANSIENT_KEYS}
+        self._save()
+
+    def finish(self, success):
+        self.state["status"] = "succeeded" if success else "failed"
+        self._save()
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.state["updated_at"] = time.time()
+        path = os.path.join(self.directory, "state.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, default=str)
+        os.replace(tmp_path, path)
+
+    def _append(self, item):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "items.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(item, default=str) + "\n")
+
+    # Per-ticket progress, recorded by the agents through context["checkpoint"] and
+    # kept per target repository (a ticket may be routed to several)
+
+    def analyzed(self, repo=None):
+        return {ticket: analysis for (item_repo, ticket), analysis in self._analyses.items() if item_repo == repo}
+
+    def record_analysis(self, ticket, analysis, repo=None):
+        self._analyses[(repo, ticket)] = analysis
+        self._append({"kind": "analysis", "repo": repo, "ticket": ticket, "analysis": analysis})
+
+    def created_issues(self, repo=None):
+        return {ticket: outcome for (item_repo, ticket), outcome in self._issues.items() if item_repo == repo}
+
+    def record_issue(self, ticket, outcome, repo=None):
+        self._issues[(repo, ticket)] = outcome
+        self._append({"kind": "issue", "repo": repo, "ticket": ticket, "outcome": outcome})
+
+
+def list_runs(directory=RUNS_DIR, limit=20):
+    runs = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return runs
+    for name in sorted(names, reverse=True)[:limit]:
+        try:
+            with open(os.path.join(directory, name, "state.json"), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        runs.append({"run_id": name, "status": state.get("status"), "updated_at": state.get("updated_at"),
+                     "completed_steps": len(state.get("completed_steps", [])), "steps": len(state.get("plan") or [])})
+    return runs
@@ -0,0 +1,141 @@
+import sys
+import json
+import asyncio
+import argparse
+
+# Headless entry point for cron and CI:
+#   python -m cli run              run the full orchestration
+#   python -m cli resume RUN_ID    continue a checkpointed run
+#   python -m cli dry-run          show the plan and its parallel stages without executing it
+#   python -m cli runs             list recent checkpointed runs
+# Gradio is never imported, and the SDKs (google-adk, google-generativeai, mcp) load
+# only once a command actually needs them; verify_import_time.py keeps it that way.
+
+
+def _summary(context):
+    created = context.get("created_issues", [])
+    return {
+        "run_id": context.get("run_id"),
+        "tickets": len(context.get("tickets", [])),
+        "analyzed": len(context.get("design_analysis", [])),
+        "analysis_errors": context.get("analysis_errors", []),
+        "created_issues": created,
+        "near_duplicates": context.get("near_duplicates", []),
+    }
+
+
+def _run_status(run_id):
+    from checkpoints import Checkpoint
+    try:
+        return Checkpoint.load(run_id).state.get("status")
+    except (OSError, ValueError):
+        return None
+
+
+async def _orchestrate(run_id=None):
+    from orchestrator import ChangeManagementOrchestrator
+    orchestrator = ChangeManagementOrchestrator()
+    try:
+        if run_id:
+            return await orchestrator.resume(run_id)
+        return await orchestrator.run({})
+    finally:
+        # A design-snapshot revalidation started by the run would be cancelled by asyncio.run
+        analyzer = sys.modules.get("agents.design_analyzer")
+        if analyzer is not None:
+            await analyzer.wait_for_background_tasks()
+
+
+def cmd_run(args):
+    context = asyncio.run(_orchestrate(getattr(args, "run_id", None)))
+    summary = _summary(context)
+    status = _run_status(summary["run_id"])
+    summary["status"] = status
+    if args.json:
+        print(json.dumps(summary, indent=2, default=str))
+    else:
+        print(f"Run {summary['run_id']}: {status}")
+        print(f"Tickets: {summary['tickets']}, analyzed: {summary['analyzed']}, analysis errors: {len(summary['analysis_errors'])}")
+        for issue in summary["created_issues"]:
+            target = issue.get("url") or issue.get("error") or ""
+            print(f" - {issue.get('ticket')} -> {issue.get('repo')}: {issue.get('status')} {target}")
+    return 0 if status == "succeeded" else 1
+
+
+def cmd_dry_run(args):
+    from registry import get_shared_registry
+    from memory_store import MemoryStore
+    from planning import GOAL, plan_fingerprint, build_dependencies, generate_plan, plan_stages, FALLBACK_PLAN
+
+    registry = get_shared_registry()
+    manifests = registry.get_all_manifests()
+    fingerprint = plan_fingerprint(GOAL, manifests)
+    memory = MemoryStore()
+    plan = memory.latest_plan(fingerprint)
+    source = "memory"
+    if not plan:
+        if args.no_llm:
+            plan, source = [dict(step) for step in FALLBACK_PLAN], "fallback"
+        else:
+            plan, source = generate_plan(GOAL, manifests, memory.successful_plans(fingerprint, limit=2)), "planner"
+
+    dependencies = build_dependencies(plan, registry)
+    stages = plan_stages(plan, dependencies)
+    if args.json:
+        print(json.dumps({
+            "fingerprint": fingerprint,
+            "source": source,
+            "plan": plan,
+            "dependencies": [sorted(deps) for deps in dependencies],
+            "stages": stages,
+        }, indent=2))
+        return 0
+
+    print(f"Plan ({source}, fingerprint {fingerprint[:12]}):")
+    for number, stage in enumerate(stages, 1):
+        steps = ", ".join(f"{plan[i].get('capability')} ({plan[i].get('agent')})" for i in stage)
+        print(f"  stage {number}: {steps}")
+    return 0
+
+
+def cmd_runs(args):
+    from checkpoints import list_runs
+    runs = list_runs(limit=args.limit)
+    if args.json:
+        print(json.dumps(runs, indent=2))
+    else:
+        for run in runs:
+            print(f"{run['run_id']}  {run['status']:<10} {run['completed_steps']}/{run['steps']} steps")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Headless change-management runs.")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("run", help="run the full orchestration").set_defaults(func=cmd_run)
+
+    resume = commands.add_parser("resume", help="continue a checkpointed run")
+    resume.add_argument("run_id")
+    resume.set_defaults(func=cmd_run)
+
+    dry_run = commands.add_parser("dry-run", help="show the plan without executing it")
+    dry_run.add_argument("--no-llm", action="store_true", help="use the built-in plan when no cached plan exists")
+    dry_run.set_defaults(func=cmd_dry_run)
+
+    runs = commands.add_parser("runs", help="list recent checkpointed runs")
+    runs.add_argument("--limit", type=int, default=20)
+    runs.set_defaults(func=cmd_runs)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from dotenv import load_dotenv
+    load_dotenv()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import hashlib
+from datetime import timedelta
+
+# Reusable cached-content handles for the shared prompt prefix (design context +
+# instructions). The prefix is uploaded once per run and every per-ticket call
+# sends only its small suffix. Backends are pluggable:
+#   gemini    - Gemini explicit context caching (genai.caching.CachedContent)
+#   inprocess - keeps the prefix in memory and prepends it locally (tests, benchmarks)
+#   none      - no handle; the stable prefix is still sent first, inline
+
+CONTEXT_CACHE_BACKEND = os.getenv("CONTEXT_CACHE_BACKEND", "gemini").lower()
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# Gemini rejects cached contents below a minimum size; smaller prefixes stay inline
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+CHARS_PER_TOKEN = 4
+
+
+def _prefix_key(model_name, prefix):
+    return hashlib.sha256(f"{model_name}\n{prefix}".encode("utf-8")).hexdigest()
+
+
+class GeminiContextCache:
+    name = "gemini"
+
+    def __init__(self, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS, min_tokens=CONTEXT_CACHE_MIN_TOKENS):
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.uploads = 0
+        self._handles = {}
+
+    async def acquire(self, model, prefix):
+        if len(prefix) / CHARS_PER_TOKEN < self.min_tokens:
+            return None
+        key = _prefix_key(model.model_name, prefix)
+        entry = self._handles.get(key)
+        # Refresh a little before the server-side TTL runs out
+        if entry and entry[1] > time.time() + 60:
+            return entry[0]
+
+        from google.generativeai import caching
+        try:
+            handle = await asyncio.to_thread(
+                caching.CachedContent.create,
+                model=model.model_name,
+                contents=[prefix],
+                ttl=timedelta(seconds=self.ttl_seconds),
+            )
+        except Exception as e:
+            print(f"[ContextCache] Could not create cached content, sending prefix inline: {e}")
+            return None
+        self.uploads += 1
+        self._handles[key] = (handle, time.time() + self.ttl_seconds)
+        return handle
+
+    def model_for(self, handle, base_model):
+        import google.generativeai as genai
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+
+class _PrefixedModel:
+    # Stands in for a cached-content model: sends the stored prefix ahead of each prompt
+    def __init__(self, base_model, prefix):
+        self.base_model = base_model
+        self.prefix = prefix
+
+    @property
+    def model_name(self):
+        return self.base_model.model_name
+
+    def generate_content(self, prompt, **kwargs):
+        return self.base_model.generate_content(self.prefix + prompt, **kwargs)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        return await self.base_model.generate_content_async(self.prefix + prompt, **kwargs)
+
+
+class InProcessContextCache:
+    name = "inprocess"
+
+    def __init__(self):
+        self.uploads = 0
+        self._prefixes = {}
+
+    async def acquire(self, model, prefix):
+        key = _prefix_key(model.model_name, prefix)
+        if key not in self._prefixes:
+            self.uploads += 1
+            self._prefixes[key] = prefix
+        return key
+
+    def model_for(self, handle, base_model):
+        return _PrefixedModel(base_model, self._prefixes[handle])
+
+
+_backend = None
+
+
+def get_context_cache():
+    # None means "no handle": callers send the prefix inline
+    global _backend
+    if _backend is None:
+        if CONTEXT_CACHE_BACKEND == "gemini":
+            _backend = GeminiContextCache()
+        elif CONTEXT_CACHE_BACKEND == "inprocess":
+            _backend = InProcessContextCache()
+        else:
+            return None
+    return _backend
+
+
+def set_context_cache(backend):
+    global _backend
+    _backend = backend
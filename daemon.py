@@ -0,0 +1,309 @@
+import os
+import json
+import hmac
+import time
+import asyncio
+import hashlib
+import argparse
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from urllib.parse import urlsplit, parse_qs
+from dotenv import load_dotenv
+
+from registry import get_shared_registry
+from mcp_pool import github_server_params, atlassian_server_params
+from issue_index import IssueIndex
+from dedup import check_against_index
+from routing import load_routing, split_slug
+import tracing
+from agents.jira_collector import OPEN_STATUSES, SYNC_OVERLAP_MINUTES, _parse_jira_time
+
+load_dotenv()
+
+# Service mode: one warm AgentRegistry (agents, Gemini models, pooled MCP sessions)
+# serves tickets as they change. Jira webhooks hit POST /webhook/jira; a poll of
+# recently updated tickets runs on a schedule as a fallback. Every changed ticket
+# goes through dedup -> design analysis -> issue creation on its own, for each
+# repository routing.json sends it to. Each ticket is one trace; GET /metrics serves
+# Prometheus metrics and GET /traces the most recent spans as OTLP/JSON.
+
+DAEMON_HOST = os.getenv("DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", "8765"))
+DAEMON_WORKERS = int(os.getenv("DAEMON_WORKERS", "2"))
+# Seconds between fallback polls (0 disables polling)
+DAEMON_POLL_SECONDS = int(os.getenv("DAEMON_POLL_SECONDS", "300"))
+# The issue index is re-synced at most this often; issues the daemon creates are indexed immediately
+DAEMON_ISSUE_SYNC_SECONDS = int(os.getenv("DAEMON_ISSUE_SYNC_SECONDS", "60"))
+JIRA_WEBHOOK_SECRET = os.getenv("JIRA_WEBHOOK_SECRET", "")
+MAX_BODY_BYTES = 1024 * 1024
+IGNORED_WEBHOOK_EVENTS = {"jira:issue_deleted"}
+
+
+class ChangeManagementDaemon:
+    def __init__(self, registry=None, workers=DAEMON_WORKERS, poll_seconds=DAEMON_POLL_SECONDS):
+        self.registry = registry or get_shared_registry()
+        self.pool = self.registry.mcp_pool
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.queue = asyncio.Queue()
+        self.stats = {"received": 0, "processed": 0, "duplicates": 0, "created": 0, "failed": 0}
+        # Latest payload per queued ticket key, so a burst of updates is processed once
+        self._pending = {}
+        # (key, repo) -> lock and holder count; dropped once nobody holds or waits for it
+        self._key_locks = {}
+        # Per repository: issue index path, last sync time, sync lock
+        self._issue_indexes = {}
+        # Highest Jira 'updated' seen by the poller, and the version each key was last
+        # processed at (raw and parsed); versions older than the poll window are dropped
+        self._poll_watermark = None
+        self._seen = {}
+        self._tasks = []
+
+    def _agent(self, capability):
+        agent = self.registry.get_agent_for_capability(capability)
+        if agent is None:
+            raise RuntimeError(f"No agent provides {capability}")
+        return agent
+
+    def enqueue(self, ticket, source):
+        key = ticket.get("key")
+        if not key:
+            return False
+        self.stats["received"] += 1
+        if key not in self._pending:
+            self.queue.put_nowait(key)
+        self._pending[key] = ticket
+        print(f"[Daemon] Queued {key} from {source} ({self.queue.qsize()} waiting)")
+        return True
+
+    @asynccontextmanager
+    async def _key_lock(self, lock_key):
+        entry = self._key_locks.get(lock_key)
+        if entry is None:
+            entry = self._key_locks[lock_key] = {"lock": asyncio.Lock(), "users": 0}
+        entry["users"] += 1
+        try:
+            async with entry["lock"]:
+                yield
+        finally:
+            entry["users"] -= 1
+            if not entry["users"]:
+                del self._key_locks[lock_key]
+
+    async def _sync_issue_index(self, repo, force=False):
+        state = self._issue_indexes.setdefault(repo, {"path": None, "synced_at": 0.0, "lock": asyncio.Lock()})
+        async with state["lock"]:
+            if not force and state["path"] and time.monotonic() - state["synced_at"] < DAEMON_ISSUE_SYNC_SECONDS:
+                return state["path"]
+            repo_owner, repo_name = split_slug(repo)
+            result = await self._agent("list_github_issues").run({
+                "action": "list_issues", "repo_owner": repo_owner, "repo_name": repo_name, "mcp_pool": self.pool,
+            })
+            state["path"] = result.get("issue_index")
+            state["synced_at"] = time.monotonic()
+            return state["path"]
+
+    async def process_ticket(self, ticket):
+        # A ticket routed to several repositories is handled for all of them concurrently
+        repos = load_routing().route(ticket)
+        return await asyncio.gather(*[self._process_for_repo(ticket, repo) for repo in repos])
+
+    async def _process_for_repo(self, ticket, repo):
+        key = ticket.get("key")
+        started = time.monotonic()
+        repo_owner, repo_name = split_slug(repo)
+        # One pass per key and repo at a time: a second update waits and then sees the issue the first created
+        async with self._key_lock((key, repo)):
+            index_path = await self._sync_issue_index(repo)
+            if index_path:
+                # Off the event loop: the first check in a process signs every indexed issue
+                match = await asyncio.to_thread(check_against_index, IssueIndex.from_path(index_path), ticket)
+                if match["exact"]:
+                    print(f"[Daemon] {key} already has issue(s) {match['exact']} in {repo}; skipping.")
+                    self.stats["duplicates"] += 1
+                    return {"ticket": key, "repo": repo, "status": "duplicate", "issues": match["exact"]}
+                if match["near"]:
+                    print(f"[Daemon] {key} looks similar to existing issue(s) {[m['number'] for m in match['near']]} in {repo}")
+
+            repo_context = {"repo_owner": repo_owner, "repo_name": repo_name, "mcp_pool": self.pool}
+            analysis = await self._agent("analyze_design_impact").run(dict(repo_context, tickets=[ticket]))
+            if analysis.get("analysis_errors"):
+                self.stats["failed"] += 1
+                return {"ticket": key, "repo": repo, "status": "failed", "error": analysis["analysis_errors"][0]["error"]}
+
+            created = await self._agent("create_github_issues").run(dict(
+                repo_context, action="create_issues", impact_analysis=analysis.get("design_analysis", []),
+            ))
+            outcome = (created.get("created_issues") or [{"ticket": key, "repo": repo, "status": "failed", "error": "nothing created"}])[0]
+            self.stats["created" if outcome.get("status") == "created" else "failed"] += 1
+            print(f"[Daemon] {key} -> {repo}: {outcome.get('status')} {outcome.get('url') or outcome.get('error') or ''} in {time.monotonic() - started:.1f}s")
+            return outcome
+
+    async def _worker(self):
+        while True:
+            key = await self.queue.get()
+            ticket = self._pending.pop(key, None)
+            try:
+                if ticket is not None:
+                    with tracing.trace("daemon.ticket", ticket=key):
+                        await self.process_ticket(ticket)
+                    self.stats["processed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"[Daemon] Processing {key} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def poll_once(self):
+        # Open tickets updated since the last poll (minus the sync overlap); the first poll sees the whole backlog
+        context = {"mcp_pool": self.pool}
+        if self._poll_watermark is not None:
+            context["jira_updated_since"] = self._poll_watermark - timedelta(minutes=SYNC_OVERLAP_MINUTES)
+        queued = 0
+        async for ticket in self._agent("fetch_jira_tickets").iter_tickets(context):
+            key = ticket.get("key")
+            updated_raw = ticket.get("fields", {}).get("updated")
+            updated = _parse_jira_time(updated_raw)
+            if updated is not None and (self._poll_watermark is None or updated > self._poll_watermark):
+                self._poll_watermark = updated
+            # The overlap window re-reads recent tickets; only new versions are queued
+            if key and self._seen.get(key, (None,))[0] != updated_raw:
+                self._seen[key] = (updated_raw, updated)
+                queued += self.enqueue(ticket, "poll")
+        if self._poll_watermark is not None:
+            # The next poll only reads tickets updated after this, so older versions can never repeat
+            cutoff = self._poll_watermark - timedelta(minutes=SYNC_OVERLAP_MINUTES)
+            self._seen = {key: seen for key, seen in self._seen.items() if seen[1] is not None and seen[1] >= cutoff}
+        return queued
+
+    async def _poller(self):
+        while True:
+            try:
+                queued = await self.poll_once()
+                print(f"[Daemon] Poll queued {queued} changed tickets.")
+            except Exception as e:
+                print(f"[Daemon] Poll failed: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    def handle_webhook(self, payload):
+        event = payload.get("webhookEvent", "")
+        issue = payload.get("issue")
+        if event in IGNORED_WEBHOOK_EVENTS or not isinstance(issue, dict):
+            return {"queued": False, "reason": f"ignored event {event or 'without issue'}"}
+        status = (issue.get("fields", {}).get("status") or {}).get("name")
+        if status is not None and status not in OPEN_STATUSES:
+            return {"queued": False, "reason": f"status {status} is not open"}
+        if issue.get("key"):
+            updated_raw = issue.get("fields", {}).get("updated")
+            self._seen[issue["key"]] = (updated_raw, _parse_jira_time(updated_raw))
+        return {"queued": self.enqueue(issue, f"webhook {event}".strip())}
+
+    def _authorized(self, headers, query, body):
+        if not JIRA_WEBHOOK_SECRET:
+            return True
+        signature = headers.get("x-hub-signature", "")
+        expected = "sha256=" + hmac.new(JIRA_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        if signature and hmac.compare_digest(signature, expected):
+            return True
+        token = (query.get("secret") or [""])[0]
+        return bool(token) and hmac.compare_digest(token, JIRA_WEBHOOK_SECRET)
+
+    async def _handle_http(self, reader, writer):
+        status, response = 500, {"error": "internal error"}
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1")
+                if line in ("\r\n", "\n", ""):
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                status, response = 413, {"error": "payload too large"}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                url = urlsplit(target)
+                status, response = self._route(method, url.path, parse_qs(url.query), headers, body)
+        except Exception as e:
+            status, response = 400, {"error": str(e)}
+        # Routes answer with JSON, except /metrics which is Prometheus text
+        if isinstance(response, str):
+            payload, content_type = response.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            payload, content_type = json.dumps(response).encode("utf-8"), "application/json"
+        reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 413: "Payload Too Large"}.get(status, "Error")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def _route(self, method, path, query, headers, body):
+        if method == "GET" and path == "/healthz":
+            return 200, {"status": "ok", "queued": self.queue.qsize(), "stats": self.stats}
+        if method == "GET" and path == "/metrics":
+            return 200, self._metrics()
+        if method == "GET" and path == "/traces":
+            limit = int((query.get("limit") or ["0"])[0] or 0)
+            return 200, tracing.recent_otlp(limit or None)
+        if method == "POST" and path == "/webhook/jira":
+            if not self._authorized(headers, query, body):
+                return 401, {"error": "bad webhook signature"}
+            return 202, self.handle_webhook(json.loads(body or b"{}"))
+        return 404, {"error": f"no route for {method} {path}"}
+
+    def _metrics(self):
+        lines = [tracing.render_prometheus().rstrip("\n")]
+        lines.append(f"# TYPE {tracing.METRIC_PREFIX}daemon_queue_length gauge")
+        lines.append(f"{tracing.METRIC_PREFIX}daemon_queue_length {self.queue.qsize()}")
+        lines.append(f"# TYPE {tracing.METRIC_PREFIX}daemon_tickets_total counter")
+        for outcome, value in self.stats.items():
+            lines.append(f'{tracing.METRIC_PREFIX}daemon_tickets_total{{outcome="{outcome}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    async def _warm_up(self):
+        # Spawn both MCP servers before the first ticket arrives
+        for params in (github_server_params(), atlassian_server_params()):
+            try:
+                await self.pool.get_session(params)
+            except Exception as e:
+                print(f"[Daemon] Warm-up failed for {params.command} {' '.join(params.args)}: {e}")
+
+    async def serve(self, host=DAEMON_HOST, port=DAEMON_PORT):
+        await self._warm_up()
+        server = await asyncio.start_server(self._handle_http, host, port)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+        if self.poll_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._poller()))
+        print(f"[Daemon] Listening on http://{host}:{port} (POST /webhook/jira, GET /healthz, /metrics, /traces)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await self.pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the change-management assistant as a service.")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    parser.add_argument("--workers", type=int, default=DAEMON_WORKERS)
+    parser.add_argument("--poll-seconds", type=int, default=DAEMON_POLL_SECONDS, help="0 disables polling")
+    args = parser.parse_args()
+    daemon = ChangeManagementDaemon(workers=args.workers, poll_seconds=args.poll_seconds)
+    try:
+        asyncio.run(daemon.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import re
+import random
+import hashlib
+import threading
+from issue_index import extract_jira_keys, issue_keys
+
+# Duplicate detection between Jira tickets and GitHub issues.
+#  - Exact: hash index from Jira key -> issue numbers (keys extracted on token boundaries).
+#  - Near: MinHash signatures over word shingles, bucketed with LSH banding, to flag
+#    issues that describe the same work but were filed under a different key.
+# Both lookups touch only the matching buckets, never the whole issue list.
+
+NUM_HASHES = 64
+BANDS = 16
+NEAR_DUPLICATE_THRESHOLD = 0.5
+# Only the head of an issue body is indexed; titles and opening lines carry the intent
+BODY_CHARS = 500
+
+_MASK_64 = (1 << 64) - 1
+_DENSIFY_ORDERS = {}
+WORD_RE = re.compile(r"[a-z0-9]+")
+# Boilerplate GitHubExecutor and Jira templates put in every title/body
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "to", "for", "in", "on", "is", "be", "with", "by", "or",
+    "implement", "changes", "impact", "analysis", "ref", "current", "design", "components",
+    "change", "redesign", "create",
+}
+
+
+def _shingles(text):
+    text = " ".join(part for part in re.split(r"\s+", text or "") if not extract_jira_keys(part))
+    words = [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+    shingles = set(words)
+    shingles.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _densify_order(num_hashes):
+    # For every bin, a fixed pseudo-random probe order over the other bins
+    if num_hashes not in _DENSIFY_ORDERS:
+        rng = random.Random(num_hashes)
+        orders = []
+        for i in range(num_hashes):
+            order = [j for j in range(num_hashes) if j != i]
+            rng.shuffle(order)
+            orders.append(order)
+        _DENSIFY_ORDERS[num_hashes] = orders
+    return _DENSIFY_ORDERS[num_hashes]
+
+
+def minhash_signature(shingles, num_hashes=NUM_HASHES):
+    # One-permutation hashing: each shingle is hashed once and lands in one of
+    # num_hashes bins, keeping the bin minimum. Empty bins borrow from another bin
+    # picked by a fixed random probe order (optimal densification); borrowing from
+    # the adjacent bin instead would make whole LSH bands hinge on a single shingle.
+    if not shingles:
+        return None
+    bins = [None] * num_hashes
+    for shingle in shingles:
+        h = _hash64(shingle)
+        slot = h % num_hashes
+        value = h // num_hashes
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    filled = list(bins)
+    orders = _densify_order(num_hashes)
+    for i in range(num_hashes):
+        if bins[i] is None:
+            for attempt, j in enumerate(orders[i]):
+                if bins[j] is not None:
+                    # Mix in the probe distance so borrowed values differ from the donor bin
+                    filled[i] = (bins[j] * 31 + attempt + 1) & _MASK_64
+                    break
+    return tuple(filled)
+
+
+def similarity(sig_a, sig_b):
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class DuplicateDetector:
+    def __init__(self, num_hashes=NUM_HASHES, bands=BANDS, threshold=NEAR_DUPLICATE_THRESHOLD):
+        if num_hashes % bands:
+            raise ValueError("num_hashes must be a multiple of bands")
+        self.num_hashes = num_hashes
+        self.bands = bands
+        self.rows = num_hashes // bands
+        self.threshold = threshold
+        self.key_index = {}
+        self.signatures = {}
+        self.titles = {}
+        self.keys = {}
+        self.buckets = {}
+
+    def add_issue(self, number, title, body=""):
+        if number in self.titles:
+            self.remove_issue(number)
+        self.titles[number] = title
+        self.keys[number] = issue_keys(title, body)
+        for key in self.keys[number]:
+            self.key_index.setdefault(key, set()).add(number)
+
+        signature = minhash_signature(_shingles(f"{title}\n{(body or '')[:BODY_CHARS]}"), self.num_hashes)
+        if signature is None:
+            return
+        self.signatures[number] = signature
+        for band, bucket in self._bands(signature):
+            self.buckets.setdefault((band, bucket), []).append(number)
+
+    def remove_issue(self, number):
+        self.titles.pop(number, None)
+        for key in self.keys.pop(number, ()):
+            numbers = self.key_index.get(key)
+            if numbers is not None:
+                numbers.discard(number)
+                if not numbers:
+                    del self.key_index[key]
+        signature = self.signatures.pop(number, None)
+        if signature is None:
+            return
+        for band, bucket in self._bands(signature):
+            numbers = self.buckets.get((band, bucket))
+            if numbers is not None and number in numbers:
+                numbers.remove(number)
+                if not numbers:
+                    del self.buckets[(band, bucket)]
+
+    def _bands(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows]
+
+    @classmethod
+    def from_issues(cls, issues, **kwargs):
+        detector = cls(**kwargs)
+        for issue in issues:
+            detector.add_issue(issue.get("number"), issue.get("title", ""), issue.get("body", ""))
+        return detector
+
+    @classmethod
+    def from_index(cls, index, **kwargs):
+        detector = cls(**kwargs)
+        detector.update_from_index(index)
+        return detector
+
+    def update_from_index(self, index, since_revision=None):
+        # Re-signs only the issues whose text changed after since_revision
+        updated = 0
+        for number, title, body in index.iter_issues(since_revision):
+            self.add_issue(number, title, body)
+            updated += 1
+        return updated
+
+    def exact_matches(self, key):
+        return sorted(self.key_index.get(key, ()))
+
+    def near_duplicates(self, text, exclude=(), limit=5):
+        signature = minhash_signature(_shingles(text), self.num_hashes)
+        if signature is None:
+            return []
+        candidates = set()
+        for band, bucket in self._bands(signature):
+            candidates.update(self.buckets.get((band, bucket), ()))
+        candidates.difference_update(exclude)
+
+        matches = []
+        for number in candidates:
+            score = similarity(signature, self.signatures[number])
+            if score >= self.threshold:
+                matches.append({"number": number, "title": self.titles.get(number, ""), "similarity": round(score, 3)})
+        matches.sort(key=lambda m: m["similarity"], reverse=True)
+        return matches[:limit]
+
+    def check_ticket(self, ticket):
+        key = ticket.get("key")
+        fields = ticket.get("fields", {})
+        exact = self.exact_matches(key) if key else []
+        text = f"{fields.get('summary', '')}\n{fields.get('description', '') or ''}"
+        near = self.near_duplicates(text, exclude=exact)
+        return {"ticket": key, "exact": exact, "near": near}
+
+
+_detector_cache = {}
+# Guards the cached detectors, which are updated in place
+_detector_lock = threading.RLock()
+
+
+def detector_for_index(index):
+    # Signing issues is the expensive part, so the detector is kept per index and
+    # keyed on its content revision: a sync that changed nothing costs nothing, and
+    # one that did re-signs only the changed issues.
+    with _detector_lock:
+        revision = index.revision()
+        cached = _detector_cache.get(index.path)
+        if cached and cached[0] == revision:
+            return cached[1]
+        if cached and cached[0] < revision:
+            detector = cached[1]
+            detector.update_from_index(index, since_revision=cached[0])
+        else:
+            # First use, or the index file was recreated
+            detector = DuplicateDetector.from_index(index)
+        _detector_cache[index.path] = (revision, detector)
+        return detector
+
+
+def check_against_index(index, ticket):
+    # Thread-safe lookup, so callers on an event loop can run it in a worker thread
+    with _detector_lock:
+        return detector_for_index(index).check_ticket(ticket)
@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Retrieval is optional; DesignAnalyzer falls back to LLM file selection
+    np = None
+
+# Local BM25 index over design documents. Docs are chunked by heading, term
+# frequencies are persisted per doc (keyed by blob SHA so only changed docs are
+# re-chunked), and postings are materialised as NumPy arrays when loaded.
+
+INDEX_DIR = os.path.join("data", "design_index")
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Rough chars-per-token ratio used to fit chunks into a prompt budget
+CHARS_PER_TOKEN = 4
+MAX_CHUNK_CHARS = 4000
+
+TOKEN_RE = re.compile(r"[a-z0-9_]+")
+HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+(.*)$")
+
+
+def available():
+    return np is not None
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) > 1]
+
+
+def chunk_document(path, content):
+    # Markdown splits on headings; anything else (e.g. .puml) on @startuml blocks or as a whole
+    chunks = []
+    if path.endswith(".md"):
+        heading = path
+        lines = []
+        for line in content.splitlines():
+            match = HEADING_RE.match(line)
+            if match and lines:
+                chunks.append((heading, "\n".join(lines).strip()))
+                lines = []
+            if match:
+                heading = match.group(1).strip() or heading
+            lines.append(line)
+        if lines:
+            chunks.append((heading, "\n".join(lines).strip()))
+    else:
+        blocks = re.split(r"(?=@startuml)", content)
+        chunks = [(path, block.strip()) for block in blocks if block.strip()]
+
+    # Very long sections are cut into pieces so one chunk cannot eat the whole budget
+    result = []
+    for heading, text in chunks:
+        if not text:
+            continue
+        for start in range(0, len(text), MAX_CHUNK_CHARS):
+            result.append({"heading": heading, "text": text[start:start + MAX_CHUNK_CHARS]})
+    return result
+
+
+class DesignIndex:
+    def __init__(self, owner, repo, directory=INDEX_DIR):
+        self.path = os.path.join(directory, f"{owner}__{repo}.json")
+        self.docs = {}
+        self._chunks = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.docs = json.load(f).get("docs", {})
+        except (OSError, ValueError):
+            self.docs = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"docs": self.docs}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[DesignIndex] Failed to save index: {e}")
+
+    def update(self, files):
+        # files: {path: {"sha": ..., "content": ...}}. Unchanged SHAs are kept as-is.
+        changed = False
+        for path in list(self.docs):
+            if path not in files:
+                del self.docs[path]
+                changed = True
+        for path, entry in files.items():
+            current = self.docs.get(path)
+            sha = entry.get("sha")
+            if current and sha and current.get("sha") == sha:
+                continue
+            chunks = []
+            for chunk in chunk_document(path, entry.get("content", "")):
+                tf = {}
+                for token in tokenize(f"{chunk['heading']} {chunk['text']}"):
+                    tf[token] = tf.get(token, 0) + 1
+                chunks.append({"heading": chunk["heading"], "text": chunk["text"], "tf": tf})
+            self.docs[path] = {"sha": sha, "chunks": chunks}
+            changed = True
+        if changed:
+            self._chunks = None
+            self._save()
+        return changed
+
+    def _build(self):
+        chunks = []
+        for path in sorted(self.docs):
+            for chunk in self.docs[path]["chunks"]:
+                chunks.append((path, chunk))
+
+        lengths = np.array([sum(chunk["tf"].values()) for _, chunk in chunks], dtype=np.float64)
+        avg_length = lengths.mean() if len(chunks) else 0.0
+
+        postings = {}
+        for chunk_id, (_, chunk) in enumerate(chunks):
+            for term, count in chunk["tf"].items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(chunk_id)
+                postings[term][1].append(count)
+
+        # Postings hold precomputed BM25 weights, so scoring a query is a few scatter-adds
+        n = len(chunks)
+        self._postings = {}
+        for term, (ids, counts) in postings.items():
+            ids = np.array(ids, dtype=np.int64)
+            tf = np.array(counts, dtype=np.float64)
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / (avg_length or 1.0))
+            self._postings[term] = (ids, idf * tf * (BM25_K1 + 1) / (tf + norm))
+        self._chunks = chunks
+
+    def search(self, query, limit=20):
+        if self._chunks is None:
+            self._build()
+        if not self._chunks:
+            return []
+        scores = np.zeros(len(self._chunks), dtype=np.float64)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                np.add.at(scores, posting[0], posting[1])
+        ranked = np.argsort(-scores)[:limit]
+        return [(self._chunks[i][0], self._chunks[i][1], float(scores[i])) for i in ranked if scores[i] > 0]
+
+    def build_context(self, query, token_budget):
+        # Highest-scoring chunks that fit the budget, regrouped in document order
+        budget_chars = token_budget * CHARS_PER_TOKEN
+        picked = []
+        used = 0
+        for path, chunk, _ in self.search(query):
+            size = len(chunk["text"])
+            if used + size > budget_chars:
+                continue
+            picked.append((path, chunk))
+            used += size
+        if not picked:
+            # Nothing matched the ticket text; fall back to the leading sections
+            for path, chunk in self._chunks or []:
+                if used + len(chunk["text"]) > budget_chars:
+                    break
+                picked.append((path, chunk))
+                used += len(chunk["text"])
+        order = {id(chunk): i for i, (_, chunk) in enumerate(self._chunks or [])}
+        picked.sort(key=lambda item: order[id(item[1])])
+
+        code_context = ""
+        for path, chunk in picked:
+            code_context += f"File: {path} (section: {chunk['heading']})\nContent:\n{chunk['text']}\n\n"
+        return code_context
@@ -0,0 +1,56 @@
+import time
+import asyncio
+import contextvars
+
+# Progress events for streaming consumers (the Gradio UI). A run started from
+# ChangeManagementOrchestrator.stream() installs a queue as the sink; agents call
+# emit() and it is a no-op when nobody is listening. The sink is a context
+# variable, so it follows the run into every task it spawns and concurrent
+# runs never see each other's events.
+#
+# Event types:
+#   run_started      run_id, resumed
+#   plan_generated   plan, reused
+#   step_started     index, agent, capability
+#   step_finished    index, agent, capability, status, duration[, error]
+#   ticket_analyzed  ticket, repo, analysis, error
+#   llm_token        site, ticket, text
+#   issue_created    ticket, repo, status, number, url, error
+#   run_finished     context
+#   run_failed       error
+
+_sink = contextvars.ContextVar("event_sink", default=None)
+
+
+def listening():
+    return _sink.get() is not None
+
+
+def emit(event_type, **data):
+    queue = _sink.get()
+    if queue is None:
+        return
+    event = {"type": event_type, "time": time.time()}
+    event.update(data)
+    queue.put_nowait(event)
+
+
+def set_sink(queue):
+    return _sink.set(queue)
+
+
+def reset_sink(token):
+    _sink.reset(token)
+
+
+async def drain(queue, task):
+    # Yield events as they arrive until the producing task is done, then flush the rest
+    while True:
+        if queue.empty() and task.done():
+            return
+        getter = asyncio.ensure_future(queue.get())
+        done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            yield getter.result()
+        else:
+            getter.cancel()
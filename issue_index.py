@@ -0,0 +1,162 @@
+import os
+import re
+import sqlite3
+from contextlib import closing
+
+# Local SQLite index of a repository's GitHub issues. It is filled once by
+# paginating every issue and then refreshed with `since=<last sync>`, so the
+# duplicate check no longer depends on a single page of list_issues.
+# Every write that changes an issue's title or body bumps the index revision and
+# stamps the row with it, so the duplicate detector can re-read only those rows.
+
+INDEX_DIR = os.path.join("data", "issue_index")
+
+# Jira keys on token boundaries, so KAN-1 never matches inside KAN-12 or XKAN-1
+JIRA_KEY_RE = re.compile(r"(?<![A-Za-z0-9_-])([A-Z][A-Z0-9_]+-\d+)(?![A-Za-z0-9_-])")
+REF_LINE_RE = re.compile(r"^\s*Ref:\s*(.+?)\s*$", re.MULTILINE)
+
+
+def extract_jira_keys(text):
+    return JIRA_KEY_RE.findall(text or "")
+
+
+def issue_keys(title, body):
+    # Keys come from the title and from the 'Ref: KEY' trailer GitHubExecutor writes into bodies
+    keys = set(extract_jira_keys(title))
+    for line in REF_LINE_RE.findall(body or ""):
+        keys.update(extract_jira_keys(line))
+    return keys
+
+
+class IssueIndex:
+    def __init__(self, owner, repo, directory=INDEX_DIR, path=None):
+        self.owner = owner
+        self.repo = repo
+        self.path = path or os.path.join(directory, f"{owner}__{repo}.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS issues (
+                    number INTEGER PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    body TEXT,
+                    state TEXT,
+                    url TEXT,
+                    updated_at TEXT,
+                    revision INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS issue_keys (
+                    key TEXT NOT NULL,
+                    number INTEGER NOT NULL,
+                    PRIMARY KEY (key, number)
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+            # Indexes created before content revisions were tracked
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(issues)")}
+            if "revision" not in columns:
+                conn.execute("ALTER TABLE issues ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS issues_revision ON issues (revision)")
+
+    @classmethod
+    def from_path(cls, path, owner="", repo=""):
+        return cls(owner, repo, path=path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def upsert_issues(self, issues):
+        count = 0
+        with closing(self._connect()) as conn, conn:
+            revision = self._revision(conn) + 1
+            changed = False
+            for issue in issues:
+                # list_issues also returns pull requests; they never count as duplicates
+                if not isinstance(issue, dict) or "pull_request" in issue or issue.get("number") is None:
+                    continue
+                number = issue["number"]
+                title = issue.get("title", "") or ""
+                body = issue.get("body", "") or ""
+                count += 1
+                row = conn.execute("SELECT title, body FROM issues WHERE number = ?", (number,)).fetchone()
+                if row is not None and row[0] == title and (row[1] or "") == body:
+                    # A re-synced issue with the same text keeps its revision
+                    conn.execute(
+                        "UPDATE issues SET state = ?, url = ?, updated_at = ? WHERE number = ?",
+                        (issue.get("state"), issue.get("html_url"), issue.get("updated_at"), number),
+                    )
+                    continue
+                changed = True
+                conn.execute(
+                    "INSERT OR REPLACE INTO issues (number, title, body, state, url, updated_at, revision) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (number, title, body, issue.get("state"), issue.get("html_url"), issue.get("updated_at"), revision),
+                )
+                conn.execute("DELETE FROM issue_keys WHERE number = ?", (number,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO issue_keys (key, number) VALUES (?, ?)",
+                    [(key, number) for key in issue_keys(title, body)],
+                )
+            if changed:
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('revision', ?)", (str(revision),))
+        return count
+
+    def numbers_for_key(self, key):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT number FROM issue_keys WHERE key = ? ORDER BY number", (key,)).fetchall()
+        return [row[0] for row in rows]
+
+    def keys_present(self, keys):
+        keys = list(keys)
+        found = set()
+        with closing(self._connect()) as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT DISTINCT key FROM issue_keys WHERE key IN ({placeholders})", chunk).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def list_issues(self):
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT number, title FROM issues ORDER BY number DESC").fetchall()
+        return [{"title": title, "number": number} for number, title in rows]
+
+    def iter_issues(self, since_revision=None):
+        # since_revision limits the rows to those whose text changed after that revision
+        query, params = "SELECT number, title, body FROM issues", ()
+        if since_revision is not None:
+            query, params = query + " WHERE revision > ?", (since_revision,)
+        with closing(self._connect()) as conn:
+            for row in conn.execute(query, params):
+                yield row
+
+    def _revision(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE name = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def revision(self):
+        with closing(self._connect()) as conn:
+            return self._revision(conn)
+
+    def max_number(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT MAX(number) FROM issues").fetchone()[0]
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+
+    def last_sync(self):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'last_sync'").fetchone()
+        return row[0] if row else None
+
+    def set_last_sync(self, value):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('last_sync', ?)", (value,))
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import hashlib
+import tracing
+
+# Content-addressed on-disk cache for Gemini responses. Entries are keyed by a
+# hash of model name, prompt and generation config, evicted least-recently-used
+# once the directory grows past LLM_CACHE_MAX_BYTES, and expire per call site.
+
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join("data", "llm_cache"))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+CACHE_ENABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+# Per call-site time-to-live in seconds. Unknown sites use the default.
+DEFAULT_TTL = 24 * 3600
+CALL_SITE_TTLS = {
+    "planner": 24 * 3600,
+    "design_selection": 24 * 3600,
+    "ticket_analysis": 7 * 24 * 3600,
+    "batch_analysis": 7 * 24 * 3600,
+}
+
+
+def _model_name(model):
+    return getattr(model, "model_name", None) or str(model)
+
+
+class LLMCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = {}
+        self.misses = {}
+        self._total_bytes = None
+
+    def make_key(self, model_name, prompt, generation_config=None):
+        payload = json.dumps({
+            "model": model_name,
+            "prompt": prompt,
+            "config": generation_config or {},
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key, site):
+        path = self._path(key)
+        ttl = CALL_SITE_TTLS.get(site, DEFAULT_TTL)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry.get("created", 0) > ttl:
+                self._remove(path)
+                entry = None
+        except (OSError, ValueError):
+            entry = None
+
+        if entry is None:
+            self.misses[site] = self.misses.get(site, 0) + 1
+            return None
+
+        self.hits[site] = self.hits.get(site, 0) + 1
+        try:
+            # mtime doubles as the LRU clock
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry.get("text")
+
+    def put(self, key, site, model_name, text):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        entry = {"site": site, "model": model_name, "created": time.time(), "text": text}
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[LLMCache] Failed to write cache entry: {e}")
+            return
+        self._account(os.path.getsize(path))
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._account(-size)
+        except OSError:
+            pass
+
+    def _account(self, delta):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self._total_bytes += delta
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        # Drop least-recently-used entries until we are back under 90% of the bound
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def stats(self):
+        sites = sorted(set(self.hits) | set(self.misses))
+        return {
+            site: {"hits": self.hits.get(site, 0), "misses": self.misses.get(site, 0)}
+            for site in sites
+        }
+
+
+_shared_cache = None
+
+
+def get_llm_cache():
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = LLMCache()
+    return _shared_cache
+
+
+def _lookup(model, prompt, site, generation_config):
+    cache = get_llm_cache()
+    model_name = _model_name(model)
+    key = cache.make_key(model_name, prompt, generation_config)
+    return cache, model_name, key, cache.get(key, site)
+
+
+def _store(cache, key, site, model_name, text, validate):
+    # Only keep replies the caller can actually use, so a malformed answer is not replayed
+    if validate is not None:
+        try:
+            validate(text)
+        except Exception:
+            return
+    cache.put(key, site, model_name, text)
+
+
+def _note_usage(span, response):
+    # Token counts come from the response's usage metadata (on the last chunk when streamed)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+    output_tokens = getattr(usage, "candidates_token_count", None) or 0
+    cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+    span.set(prompt_tokens=prompt_tokens, output_tokens=output_tokens, cached_tokens=cached_tokens)
+    site = span.attributes.get("target", "")
+    tracing.count("llm_tokens_total", prompt_tokens, site=site, kind="prompt")
+    tracing.count("llm_tokens_total", output_tokens, site=site, kind="output")
+    tracing.count("llm_tokens_total", cached_tokens, site=site, kind="cached")
+
+
+def _llm_span(model, prompt, site, key_prefix):
+    return tracing.span("llm.generate", target=site, model=_model_name(model),
+                        prompt_bytes=len(prompt), cached_prefix_bytes=len(key_prefix) or None)
+
+
+def _note_hit(span, text):
+    span.set(cache_hit=True, output_bytes=len(text))
+    tracing.count("llm_cache_hits_total", site=span.attributes.get("target", ""))
+
+
+def _generate(model, prompt, generation_config, span, request_options=None):
+    kwargs = {"request_options": request_options} if request_options else {}
+    response = model.generate_content(prompt, generation_config=generation_config, **kwargs)
+    _note_usage(span, response)
+    span.set(cache_hit=False, output_bytes=len(response.text))
+    return response.text
+
+
+def cached_generate(model, prompt, site, generation_config=None, validate=None, key_prefix="", request_options=None):
+    # key_prefix is prompt text already bound into the model (a cached-content prefix);
+    # it is part of the cache key but not sent again. request_options (e.g. a timeout)
+    # is passed to the SDK and is not part of the key.
+    with _llm_span(model, prompt, site, key_prefix) as span:
+        if not CACHE_ENABLED:
+            return _generate(model, prompt, generation_config, span, request_options)
+
+        cache, model_name, key, text = _lookup(model, key_prefix + prompt, site, generation_config)
+        if text is not None:
+            _note_hit(span, text)
+            return text
+        text = _generate(model, prompt, generation_config, span, request_options)
+        _store(cache, key, site, model_name, text, validate)
+        return text
+
+
+async def _generate_async(model, prompt, generation_config, on_chunk, span, request_options=None):
+    kwargs = {"request_options": request_options} if request_options else {}
+    if on_chunk is None:
+        response = await model.generate_content_async(prompt, generation_config=generation_config, **kwargs)
+        _note_usage(span, response)
+        span.set(cache_hit=False, output_bytes=len(response.text))
+        return response.text
+    # Streamed: chunks are handed to on_chunk as they arrive and joined for the cache
+    parts = []
+    chunk = None
+    response = await model.generate_content_async(prompt, generation_config=generation_config, stream=True, **kwargs)
+    async for chunk in response:
+        text = chunk.text
+        if text:
+            if not parts:
+                span.set(first_token_ms=round(span.seconds * 1000, 1))
+            parts.append(text)
+            on_chunk(text)
+    _note_usage(span, chunk)
+    text = "".join(parts)
+    span.set(cache_hit=False, streamed=True, output_bytes=len(text))
+    return text
+
+
+async def cached_generate_async(model, prompt, site, generation_config=None, validate=None, key_prefix="", on_chunk=None, request_options=None):
+    with _llm_span(model, prompt, site, key_prefix) as span:
+        if not CACHE_ENABLED:
+            return await _generate_async(model, prompt, generation_config, on_chunk, span, request_options)
+
+        cache, model_name, key, text = _lookup(model, key_prefix + prompt, site, generation_config)
+        if text is not None:
+            _note_hit(span, text)
+            if on_chunk is not None:
+                on_chunk(text)
+            return text
+        text = await _generate_async(model, prompt, generation_config, on_chunk, span, request_options)
+        _store(cache, key, site, model_name, text, validate)
+        return text
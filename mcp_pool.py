@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import asyncio
+import shlex
+import hashlib
+import tracing
+
+# How long to wait for a fresh server (npx resolution + handshake) to come up.
+CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "120"))
+# Sessions without a successful call for this many seconds are pinged before being
+# handed out again; a call that finds the server gone retires its session at once.
+HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("MCP_HEALTH_CHECK_TIMEOUT", "5"))
+# Launch commands for the MCP servers; override them to point at another build or at
+# the stand-in servers in benchmarks/stub_mcp_server.py.
+GITHUB_MCP_COMMAND = os.getenv("GITHUB_MCP_COMMAND", "npx -y @modelcontextprotocol/server-github")
+ATLASSIAN_MCP_COMMAND = os.getenv("ATLASSIAN_MCP_COMMAND", "npx -y @modelcontextprotocol/server-atlassian")
+
+
+def _server_params(command_line):
+    # The MCP SDK is imported on first use so importing the pool stays cheap
+    from mcp import StdioServerParameters
+    command, *args = shlex.split(command_line)
+    return StdioServerParameters(command=command, args=args, env=os.environ.copy())
+
+
+def github_server_params():
+    return _server_params(GITHUB_MCP_COMMAND)
+
+
+def atlassian_server_params():
+    return _server_params(ATLASSIAN_MCP_COMMAND)
+
+
+def server_key(params):
+    # Sessions are keyed by the launch spec. The environment is hashed rather than
+    # stored so rotated credentials get a fresh server without keeping secrets around.
+    env = params.env or {}
+    env_hash = hashlib.sha256(json.dumps(sorted(env.items())).encode()).hexdigest()[:16]
+    return (params.command, tuple(params.args), str(params.cwd or ""), env_hash)
+
+
+def _server_label(params):
+    return " ".join([os.path.basename(params.command)] + list(params.args))[:120]
+
+
+def _connection_lost(error):
+    # A dead server surfaces as the SDK's "Connection closed" error (JSON-RPC -32000)
+    # or as a closed/broken stream, depending on where the call was when it died
+    if isinstance(error, (ConnectionError, EOFError)):
+        return True
+    if type(error).__name__ in ("ClosedResourceError", "BrokenResourceError", "EndOfStream"):
+        return True
+    return "connection closed" in str(error).lower()
+
+
+def is_error_result(result):
+    # The flag is isError on older mcp releases and is_error on newer ones
+    return bool(getattr(result, "isError", False) or getattr(result, "is_error", False))
+
+
+class _TracedSession:
+    # Hands out the pooled session with every call_tool wrapped in an mcp.call_tool span;
+    # everything else is passed straight through. A call that finds the server gone
+    # retires the connection, so the next get_session reconnects.
+    def __init__(self, session, server, conn):
+        self._session = session
+        self._server = server
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    async def call_tool(self, name, arguments=None, *args, **kwargs):
+        request_bytes = len(json.dumps(arguments or {}, default=str))
+        with tracing.span("mcp.call_tool", target=name, server=self._server, request_bytes=request_bytes) as span:
+            try:
+                result = await self._session.call_tool(name, arguments, *args, **kwargs)
+            except Exception as e:
+                if _connection_lost(e):
+                    self._conn.mark_lost(e)
+                raise
+            self._conn.last_used = time.monotonic()
+            response_bytes = sum(len(getattr(item, "text", "") or "") for item in result.content or [])
+            span.set(response_bytes=response_bytes)
+            if is_error_result(result):
+                span.fail(result.content[0].text if result.content else "tool error")
+            tracing.count("mcp_payload_bytes_total", request_bytes, tool=name, direction="request")
+            tracing.count("mcp_payload_bytes_total", response_bytes, tool=name, direction="response")
+            return result
+
+
+class _PooledConnection:
+    # The stdio transport and the session are async context managers whose cancel
+    # scopes must be exited by the task that entered them, so each connection is
+    # owned by a dedicated background task that stays parked until close().
+
+    def __init__(self, params):
+        self.params = params
+        self.session = None
+        self.traced = None
+        self.error = None
+        self.tool_names = None
+        self.loop = asyncio.get_running_loop()
+        self.last_used = time.monotonic()
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(self._serve())
+
+    async def _serve(self):
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+        # Startup is traced in two parts: mcp.spawn (process start) and mcp.initialize
+        # (until the server answers the handshake, which includes npx package resolution)
+        label = _server_label(self.params)
+        started = spawned = time.time_ns()
+        phase = "mcp.spawn"
+        try:
+            async with stdio_client(self.params) as (read, write):
+                spawned = time.time_ns()
+                tracing.record("mcp.spawn", started, spawned, target=label)
+                phase = "mcp.initialize"
+                async with ClientSession(read, write) as session:
+                    init = await session.initialize()
+                    info = getattr(init, "server_info", None) or getattr(init, "serverInfo", None)
+                    server = getattr(info, "name", None) or label
+                    tracing.record("mcp.initialize", spawned, time.time_ns(), target=server)
+                    phase = None
+                    self.session = session
+                    self.traced = _TracedSession(session, server, self)
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self.error = e
+            if phase is not None:
+                tracing.record(phase, spawned if phase == "mcp.initialize" else started, time.time_ns(), error=str(e) or type(e).__name__, target=label)
+        finally:
+            self.session = None
+            self.traced = None
+            self._ready.set()
+
+    async def wait_ready(self, timeout):
+        await asyncio.wait_for(self._ready.wait(), timeout)
+        if self.session is None:
+            raise ConnectionError(f"MCP server {self.params.command} {' '.join(self.params.args)} failed to start: {self.error}")
+
+    def is_alive(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return self.session is not None and not self._closing.is_set() and not self._task.done() and loop is self.loop
+
+    def mark_lost(self, error):
+        # The owner task would otherwise stay parked with a dead session; let it tear down
+        if not self._closing.is_set():
+            print(f"[MCPConnectionPool] Lost connection to {_server_label(self.params)}: {error}")
+            self.error = error
+            self._closing.set()
+
+    async def close(self):
+        self._closing.set()
+        if asyncio.get_running_loop() is not self.loop:
+            # The owning loop is gone (e.g. a previous asyncio.run); its task was
+            # cancelled with it, which already tore the subprocess down.
+            return
+        try:
+            await asyncio.wait_for(self._task, 5)
+        except Exception:
+            self._task.cancel()
+
+
+class MCPConnectionPool:
+    def __init__(self):
+        self._connections = {}
+        self._locks = {}
+
+    def _lock_for(self, key):
+        loop = asyncio.get_running_loop()
+        entry = self._locks.get(key)
+        if entry is None or entry[0] is not loop:
+            entry = (loop, asyncio.Lock())
+            self._locks[key] = entry
+        return entry[1]
+
+    async def _healthy(self, conn):
+        if not conn.is_alive():
+            return False
+        if time.monotonic() - conn.last_used < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            await asyncio.wait_for(conn.session.send_ping(), HEALTH_CHECK_TIMEOUT)
+            conn.last_used = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    async def get_session(self, params):
+        key = server_key(params)
+        async with self._lock_for(key):
+            conn = self._connections.get(key)
+            if conn is not None and not await self._healthy(conn):
+                print(f"[MCPConnectionPool] Session for {params.command} {' '.join(params.args)} is unhealthy. Reconnecting...")
+                self._connections.pop(key, None)
+                await conn.close()
+                conn = None
+
+            if conn is None:
+                conn = _PooledConnection(params)
+                try:
+                    await conn.wait_ready(CONNECT_TIMEOUT)
+                except Exception:
+                    await conn.close()
+                    raise
+                self._connections[key] = conn
+
+            # last_used is refreshed by successful calls, not by handing the session out,
+            # so a session that has only been failing still gets pinged
+            return conn.traced
+
+    async def list_tool_names(self, params):
+        # Tool lists don't change for the lifetime of a server process, so cache them per connection.
+        session = await self.get_session(params)
+        conn = self._connections.get(server_key(params))
+        if conn.tool_names is None:
+            tools_result = await session.list_tools()
+            conn.tool_names = [t.name for t in tools_result.tools]
+        return conn.tool_names
+
+    async def invalidate(self, params):
+        conn = self._connections.pop(server_key(params), None)
+        if conn is not None:
+            await conn.close()
+
+    async def close(self):
+        connections = list(self._connections.values())
+        self._connections.clear()
+        for conn in connections:
+            await conn.close()
+
+
+_shared_pool = None
+
+
+def get_shared_pool():
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = MCPConnectionPool()
+    return _shared_pool
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing
+
+# Orchestrator memory: one row per run plus one row per executed step, in SQLite.
+# A run is recorded with a single INSERT transaction (safe under concurrent
+# runs thanks to WAL + busy timeout), plans are looked up through an index on
+# the goal/manifest fingerprint, and old runs are pruned by id range, so memory
+# I/O per run does not grow with history. Each run also keeps the rollup of its
+# trace (time per span type, LLM tokens and cache hits, MCP calls and payload bytes).
+
+MEMORY_PATH = os.getenv("ORCHESTRATOR_MEMORY_PATH", os.path.join("data", "orchestrator_memory.sqlite3"))
+# Number of runs kept; 0 keeps everything
+MEMORY_RETENTION = int(os.getenv("ORCHESTRATOR_MEMORY_RETENTION", "500"))
+LEGACY_MEMORY_FILE = os.path.join("data", "orchestrator_memory.json")
+
+
+class MemoryStore:
+    def __init__(self, path=MEMORY_PATH, retention=MEMORY_RETENTION):
+        self.path = path
+        self.retention = retention
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    goal TEXT,
+                    fingerprint TEXT,
+                    success INTEGER NOT NULL,
+                    duration REAL,
+                    plan TEXT NOT NULL,
+                    trace_summary TEXT
+                );
+                CREATE INDEX IF NOT EXISTS runs_by_fingerprint ON runs (fingerprint, success, id);
+                CREATE INDEX IF NOT EXISTS runs_by_success ON runs (success, id);
+                CREATE TABLE IF NOT EXISTS steps (
+                    run_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    agent TEXT,
+                    capability TEXT,
+                    status TEXT,
+                    duration REAL,
+                    error TEXT,
+                    PRIMARY KEY (run_id, position)
+                );
+            """)
+            # Databases created before trace summaries were recorded
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "trace_summary" not in columns:
+                conn.execute("ALTER TABLE runs ADD COLUMN trace_summary TEXT")
+        self._migrate_legacy()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _migrate_legacy(self, legacy_file=LEGACY_MEMORY_FILE):
+        # One-off import of the old JSON memory so learned plans survive the switch
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        with closing(self._connect()) as conn:
+            empty = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 0
+        if empty:
+            for entry in entries if isinstance(entries, list) else []:
+                if isinstance(entry, dict) and entry.get("plan"):
+                    self.record_run(entry.get("goal"), entry["plan"], bool(entry.get("success")),
+                                    entry.get("log") or [], entry.get("fingerprint"))
+        try:
+            os.replace(legacy_file, f"{legacy_file}.migrated")
+        except OSError:
+            pass
+
+    def record_run(self, goal, plan, success, log, fingerprint=None, duration=None, created_at=None, trace_summary=None):
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (created_at, goal, fingerprint, success, duration, plan, trace_summary) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (created_at or time.time(), goal, fingerprint, int(bool(success)), duration, json.dumps(plan),
+                 json.dumps(trace_summary) if trace_summary is not None else None),
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO steps (run_id, position, agent, capability, status, duration, error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, position, (entry.get("step") or {}).get("agent"), (entry.get("step") or {}).get("capability"),
+                     entry.get("status"), entry.get("duration"), entry.get("error"))
+                    for position, entry in enumerate(log) if entry
+                ],
+            )
+            if self.retention > 0:
+                # Ids are monotonic, so retention is a range delete on the primary key
+                cutoff = run_id - self.retention
+                if cutoff > 0:
+                    conn.execute("DELETE FROM runs WHERE id <= ?", (cutoff,))
+                    conn.execute("DELETE FROM steps WHERE run_id <= ?", (cutoff,))
+        return run_id
+
+    def latest_plan(self, fingerprint):
+        # Most recent successful plan for this exact goal + manifests
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT plan FROM runs WHERE fingerprint = ? AND success = 1 ORDER BY id DESC LIMIT 1",
+                (fingerprint,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def successful_plans(self, fingerprint=None, limit=2):
+        # Planner examples: most recent successes, same fingerprint first
+        plans = []
+        seen = set()
+        with closing(self._connect()) as conn:
+            queries = []
+            if fingerprint:
+                queries.append(("SELECT plan FROM runs WHERE fingerprint = ? AND success = 1 ORDER BY id DESC LIMIT ?", (fingerprint, limit)))
+            queries.append(("SELECT plan FROM runs WHERE success = 1 ORDER BY id DESC LIMIT ?", (limit * 4,)))
+            for sql, params in queries:
+                for (text,) in conn.execute(sql, params):
+                    if text not in seen and len(plans) < limit:
+                        seen.add(text)
+                        plans.append(json.loads(text))
+        return plans
+
+    def recent_runs(self, limit=10):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, created_at, goal, fingerprint, success, duration, plan, trace_summary FROM runs ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+            runs = []
+            for run_id, created_at, goal, fingerprint, success, duration, plan, trace_summary in rows:
+                steps = conn.execute(
+                    "SELECT agent, capability, status, duration, error FROM steps WHERE run_id = ? ORDER BY position",
+                    (run_id,),
+                ).fetchall()
+                runs.append({
+                    "id": run_id, "created_at": created_at, "goal": goal, "fingerprint": fingerprint,
+                    "success": bool(success), "duration": duration, "plan": json.loads(plan),
+                    "trace_summary": json.loads(trace_summary) if trace_summary else None,
+                    "steps": [
+                        {"agent": a, "capability": c, "status": s, "duration": d, "error": e}
+                        for a, c, s, d, e in steps
+                    ],
+                })
+        return runs
@@ -0,0 +1,161 @@
+import os
+import json
+import tracing
+from llm_cache import cached_generate, cached_generate_async
+
+# Model tiering per LLM call site. Control-plane calls (planning, design-file
+# selection) are small JSON tasks and run on a fast, cheap model; ticket analysis
+# keeps the analysis-grade model. Each site has a model, max output tokens,
+# temperature and timeout, and may name a bigger model to escalate to when its
+# structured output does not parse. model_routes.json overrides the defaults per
+# site (any subset of keys):
+#   {
+#     "planner": {"model": "gemini-2.5-flash-lite", "max_output_tokens": 1024,
+#                 "temperature": 0.0, "timeout": 30, "escalate_to": "gemini-2.5-flash"},
+#     "ticket_analysis": {"model": "gemini-2.5-pro", "timeout": 180}
+#   }
+# Sites without a route use "default". "escalate_to": null disables escalation.
+
+MODEL_ROUTES_FILE = os.getenv("MODEL_ROUTES_FILE", "model_routes.json")
+ANALYSIS_MODEL = "gemini-2.5-flash"
+CONTROL_MODEL = "gemini-2.5-flash-lite"
+
+DEFAULT_ROUTES = {
+    "default": {"model": ANALYSIS_MODEL, "max_output_tokens": None, "temperature": None, "timeout": 120, "escalate_to": None},
+    "planner": {"model": CONTROL_MODEL, "max_output_tokens": 1024, "temperature": 0.0, "timeout": 30, "escalate_to": ANALYSIS_MODEL},
+    "design_selection": {"model": CONTROL_MODEL, "max_output_tokens": 256, "temperature": 0.0, "timeout": 20, "escalate_to": ANALYSIS_MODEL},
+    # Analysis output stays uncapped at the model's default temperature: on 2.5 models
+    # thinking tokens count against max_output_tokens, so a cap can cut analyses short
+    "ticket_analysis": {"model": ANALYSIS_MODEL, "max_output_tokens": None, "temperature": None, "timeout": 120, "escalate_to": None},
+    # A batch reply that does not parse is retried on the bigger model before the
+    # analyzer falls back to one call per ticket
+    "batch_analysis": {"model": ANALYSIS_MODEL, "max_output_tokens": None, "temperature": None, "timeout": 180, "escalate_to": "gemini-2.5-pro"},
+}
+ROUTE_KEYS = ("model", "max_output_tokens", "temperature", "timeout", "escalate_to")
+
+_cache = {}
+_models = {}
+
+
+class ModelRoute:
+    def __init__(self, site, settings):
+        self.site = site
+        self.model = settings.get("model") or ANALYSIS_MODEL
+        self.max_output_tokens = settings.get("max_output_tokens")
+        self.temperature = settings.get("temperature")
+        self.timeout = settings.get("timeout")
+        self.escalate_to = settings.get("escalate_to")
+
+    def generation_config(self, overrides=None):
+        # Route settings first; a call's own config (e.g. a response schema) wins
+        config = {}
+        if self.max_output_tokens is not None:
+            config["max_output_tokens"] = self.max_output_tokens
+        if self.temperature is not None:
+            config["temperature"] = self.temperature
+        config.update(overrides or {})
+        return config
+
+    def request_options(self):
+        return {"timeout": self.timeout} if self.timeout else None
+
+
+def load_routes(path=MODEL_ROUTES_FILE):
+    # Reloaded only when the file changes
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    overrides = {}
+    if mtime is not None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                overrides = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ModelRouter] Could not read {path}: {e}. Using the default routes.")
+    routes = {site: dict(settings) for site, settings in DEFAULT_ROUTES.items()}
+    for site, settings in (overrides or {}).items():
+        if isinstance(settings, dict):
+            base = routes.get(site) or dict(routes["default"])
+            base.update({key: value for key, value in settings.items() if key in ROUTE_KEYS})
+            routes[site] = base
+    _cache[path] = (mtime, routes)
+    return routes
+
+
+def route_for(site):
+    routes = load_routes()
+    return ModelRoute(site, routes.get(site) or routes["default"])
+
+
+def get_model(name):
+    # One client per model name, created on first use so importing the router stays cheap
+    model = _models.get(name)
+    if model is None:
+        import google.generativeai as genai
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if api_key:
+            genai.configure(api_key=api_key)
+        model = _models[name] = genai.GenerativeModel(name)
+    return model
+
+
+def model_for(site):
+    return get_model(route_for(site).model)
+
+
+def parse_json_reply(text):
+    # JSON replies sometimes arrive wrapped in a markdown code block
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text)
+
+
+def _escalation_span(route, error):
+    # The escalated llm.generate call is a child of this span
+    print(f"[ModelRouter] {route.site} reply from {route.model} did not parse ({error}). Escalating to {route.escalate_to}.")
+    tracing.count("llm_escalations_total", site=route.site, model=route.escalate_to)
+    return tracing.span("llm.escalate", target=route.site, from_model=route.model, to_model=route.escalate_to, error=str(error)[:200])
+
+
+def generate(site, prompt, validate=None, generation_config=None, model=None, key_prefix=""):
+    # Synchronous call through the route; validate parses the reply and raises when it is unusable
+    route = route_for(site)
+    config = route.generation_config(generation_config)
+    text = cached_generate(model or get_model(route.model), prompt, site, config, validate, key_prefix,
+                           request_options=route.request_options())
+    if validate is None or not route.escalate_to:
+        return text
+    try:
+        validate(text)
+        return text
+    except Exception as e:
+        error = e
+    # The escalated call goes to a plain model, so a cached-content prefix is sent inline
+    with _escalation_span(route, error):
+        return cached_generate(get_model(route.escalate_to), key_prefix + prompt, site, config, validate,
+                               request_options=route.request_options())
+
+
+async def generate_async(site, prompt, validate=None, generation_config=None, model=None, key_prefix="", on_chunk=None):
+    route = route_for(site)
+    config = route.generation_config(generation_config)
+    text = await cached_generate_async(model or get_model(route.model), prompt, site, config, validate, key_prefix,
+                                       on_chunk, request_options=route.request_options())
+    if validate is None or not route.escalate_to:
+        return text
+    try:
+        validate(text)
+        return text
+    except Exception as e:
+        error = e
+    # Not streamed again: the first attempt's chunks were already delivered
+    with _escalation_span(route, error):
+        return await cached_generate_async(get_model(route.escalate_to), key_prefix + prompt, site, config, validate,
+                                           request_options=route.request_options())
@@ -1,65 +1,55 @@
-import os
 import json
-import glob
-import google.generativeai as genai
+import time
+import asyncio
 from google.adk import Agent
 
-# Import agents
-from agents.jira_collector import JiraCollector
-from agents.design_analyzer import DesignAnalyzer
-from agents.github_executor import GitHubExecutor
-
-# Configure Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-
-class AgentRegistry:
-    def __init__(self):
-        self.agents = {}
-        self.manifests = {}
-        self._load_agents()
-
-    def _load_agents(self):
-        # Instantiate agents
-        # In a real system, this could be dynamic import based on manifest
-        self.agents["JiraCollector"] = JiraCollector()
-        self.agents["DesignAnalyzer"] = DesignAnalyzer()
-        self.agents["GitHubExecutor"] = GitHubExecutor()
-
-        # Load manifests
-        manifest_files = glob.glob("manifests/*.json")
-        for mf in manifest_files:
-            try:
-                with open(mf, "r") as f:
-                    manifest = json.load(f)
-                    self.manifests[manifest["name"]] = manifest
-            except Exception as e:
-                print(f"Error loading manifest {mf}: {e}")
-
-    def get_agent(self, name):
-        return self.agents.get(name)
-
-    def get_all_manifests(self):
-        return list(self.manifests.values())
-
-    def get_agent_for_capability(self, capability):
-        for name, manifest in self.manifests.items():
-            if capability in manifest.get("capabilities", []):
-                return self.agents.get(name)
-        return None
+# Agents are loaded lazily by the registry from their manifests
+from registry import get_shared_registry
+from llm_cache import get_llm_cache
+from planning import GOAL, plan_fingerprint, build_dependencies, generate_plan
+from issue_index import IssueIndex
+from dedup import DuplicateDetector, detector_for_index
+import events
+from memory_store import MemoryStore
+from checkpoints import Checkpoint
+from routing import load_routing, split_slug
+import tracing
 
 class ChangeManagementOrchestrator(Agent):
     def __init__(self, name="ChangeManagementOrchestrator"):
         super().__init__(name=name)
 
-    async def run(self, context={}):
-        memory_file = os.path.join("data", "orchestrator_memory.json")
-        print(f"[{self.name}] Starting A2A dynamic orchestration...")
+    async def run(self, context=None):
+        return await self._run({} if context is None else context, Checkpoint.create())
+
+    async def resume(self, run_id):
+        # Continue a checkpointed run: finished steps are skipped with their outputs
+        # restored, and per-ticket work that already completed is not redone
+        checkpoint = Checkpoint.load(run_id)
+        print(f"[{self.name}] Resuming run {run_id} ({len(checkpoint.completed_steps)} steps already done)...")
+        return await self._run(checkpoint.context(), checkpoint)
+
+    async def _run(self, context, checkpoint):
+        # Every run is one trace: planning, each step, each MCP call and each Gemini call
+        # are spans in it. It is exported once the root span has closed.
+        with tracing.trace("orchestrator.run", run_id=checkpoint.run_id, resumed=bool(checkpoint.plan)) as run_trace:
+            result = await self._run_traced(context, checkpoint, run_trace)
+        try:
+            run_trace.export(checkpoint.run_id)
+        except OSError as e:
+            print(f"[{self.name}] Failed to export trace: {e}")
+        return result
+
+    async def _run_traced(self, context, checkpoint, run_trace):
+        run_started = time.monotonic()
+        print(f"[{self.name}] Starting A2A dynamic orchestration (run {checkpoint.run_id})...")
+        context["run_id"] = checkpoint.run_id
+        context["trace_id"] = run_trace.trace_id
+        events.emit("run_started", run_id=checkpoint.run_id, resumed=bool(checkpoint.plan))
         
-        # Initialize components here to avoid Pydantic field issues
-        registry = AgentRegistry()
-        model = genai.GenerativeModel("gemini-2.5-flash")
+        # The registry is process-wide: manifests are re-read only when they change and
+        # agents are built the first time a step needs them
+        registry = get_shared_registry()
         
         # 1. Discovery
         manifests = registry.get_all_manifests()
@@ -70,168 +60,289 @@ class ChangeManagementOrchestrator(Agent):
         print(f"[{self.name}] Discovered capabilities: {capabilities}")
 
         # 2. Planning
-        goal = "Fetch Jira tickets, check against existing GitHub issues to avoid duplicates, analyze design impact for new tickets, and create GitHub issues."
+        goal = GOAL
         
-        # Load memory
-        memory = self._load_memory(memory_file)
+        # Memory lookups go through the fingerprint index instead of loading the history
+        memory = MemoryStore()
         
-        plan = self._generate_plan(goal, manifests, model, memory)
-        print(f"[{self.name}] Generated Plan: {json.dumps(plan, indent=2)}")
+        # Reuse the last successful plan when neither the goal nor any manifest changed
+        with tracing.span("orchestrator.plan") as plan_span:
+            fingerprint = self._plan_fingerprint(goal, manifests)
+            plan = checkpoint.plan or memory.latest_plan(fingerprint)
+            reused = bool(plan)
+            if checkpoint.plan:
+                plan_span.set(source="checkpoint")
+                print(f"[{self.name}] Continuing the checkpointed plan.")
+            elif plan:
+                plan_span.set(source="memory")
+                print(f"[{self.name}] Reusing cached plan (fingerprint {fingerprint[:12]}).")
+            else:
+                plan_span.set(source="planner")
+                plan = self._generate_plan(goal, manifests, memory.successful_plans(fingerprint, limit=2))
+                print(f"[{self.name}] Generated Plan: {json.dumps(plan, indent=2)}")
+            plan_span.set(steps=len(plan), fingerprint=fingerprint[:12])
+        events.emit("plan_generated", plan=plan, reused=reused)
+        checkpoint.start(plan, fingerprint)
 
         # 3. Execution
-        execution_log = []
-        success = True
-        
-        for step in plan:
-            agent_name = step.get("agent")
-            capability = step.get("capability")
-            reasoning = step.get("reasoning")
-            
-            print(f"[{self.name}] Executing Step: {capability} ({reasoning})")
-            
-            agent = registry.get_agent(agent_name)
-            if not agent:
-                print(f"[{self.name}] Agent {agent_name} not found. Skipping.")
-                success = False
-                execution_log.append({"step": step, "status": "failed", "error": "Agent not found"})
-                continue
-
-            # Prepare context for the agent
-            # Special handling for GitHubExecutor which needs 'action'
-            if agent_name == "GitHubExecutor":
-                if "list" in capability:
-                    context["action"] = "list_issues"
-                elif "create" in capability:
-                    context["action"] = "create_issues"
-                    # Map design_analysis to impact_analysis for backward compatibility if needed, 
-                    # or update GitHubExecutor to handle design_analysis.
-                    # For now, let's assume GitHubExecutor expects 'impact_analysis' key, 
-                    # so we might need to map it if DesignAnalyzer returns 'design_analysis'.
-                    if "design_analysis" in context:
-                        context["impact_analysis"] = context["design_analysis"]
+        # Steps form a DAG over their declared inputs/outputs; independent steps
+        # (e.g. the Jira fetch and the GitHub issue listing) run concurrently.
+        context["mcp_pool"] = registry.mcp_pool
+        context["checkpoint"] = checkpoint
+        dependencies = self._build_dependencies(plan, registry)
+        execution_log = await self._execute_plan(plan, dependencies, registry, context, checkpoint)
+        success = all(entry["status"] == "success" for entry in execution_log)
+        run_trace.root.set(success=success)
+        checkpoint.finish(success)
+        if not success:
+            print(f"[{self.name}] Run {checkpoint.run_id} did not fully succeed; resume it with resume('{checkpoint.run_id}').")
 
-            try:
-                # Execute
-                result = await agent.run(context)
-                context.update(result)
-                execution_log.append({"step": step, "status": "success"})
+        # The pool stays warm for the next run but is not part of the result
+        context.pop("mcp_pool", None)
+        context.pop("checkpoint", None)
 
-                # Post-processing for optimization (Duplicate Filtering)
-                if capability == "list_github_issues" and "tickets" in context:
-                    self._filter_duplicates(context)
-            except Exception as e:
-                print(f"[{self.name}] Step failed: {e}")
-                success = False
-                execution_log.append({"step": step, "status": "failed", "error": str(e)})
+        cache_stats = get_llm_cache().stats()
+        context["llm_cache_stats"] = cache_stats
+        print(f"[{self.name}] LLM cache: {cache_stats}")
 
         # Save memory
-        self._save_memory(memory_file, goal, plan, success, execution_log)
+        try:
+            memory.record_run(goal, plan, success, execution_log, fingerprint,
+                              duration=round(time.monotonic() - run_started, 3),
+                              trace_summary=run_trace.summary())
+        except Exception as e:
+            print(f"[{self.name}] Failed to save memory: {e}")
 
         print(f"[{self.name}] Orchestration complete.")
         return context
 
-    def _load_memory(self, memory_file):
-        if os.path.exists(memory_file):
-            try:
-                with open(memory_file, "r") as f:
-                    return json.load(f)
-            except:
-                pass
-        return []
-
-    def _save_memory(self, memory_file, goal, plan, success, log):
-        memory = self._load_memory(memory_file)
-        entry = {
-            "goal": goal,
-            "plan": plan,
-            "success": success,
-            "log": log,
-            # "timestamp": datetime.now().isoformat() # Requires import datetime
-        }
-        memory.append(entry)
-        # Keep only last 10 entries
-        if len(memory) > 10:
-            memory = memory[-10:]
-            
+    async def stream(self, context=None, run_id=None):
+        # Same run as run() (or resume(run_id)), exposed as an async stream of progress
+        # events. The last event is run_finished (carrying the final context) or run_failed.
+        queue = asyncio.Queue()
+        token = events.set_sink(queue)
         try:
-            with open(memory_file, "w") as f:
-                json.dump(memory, f, indent=2)
-        except Exception as e:
-            print(f"[{self.name}] Failed to save memory: {e}")
+            # The task copies the current context, so the run and everything it spawns emit into queue
+            if run_id:
+                task = asyncio.create_task(self.resume(run_id))
+            else:
+                task = asyncio.create_task(self.run({} if context is None else context))
+        finally:
+            events.reset_sink(token)
 
-    def _generate_plan(self, goal, manifests, model, memory):
-        # Prompt Gemini to generate a plan
-        manifest_str = json.dumps(manifests, indent=2)
-        
-        # Format memory for context
-        memory_context = ""
-        if memory:
-            successful_plans = [m["plan"] for m in memory if m["success"]]
-            if successful_plans:
-                memory_context = f"\nHere are examples of successful plans from the past:\n{json.dumps(successful_plans[:2], indent=2)}\n"
-        
-        prompt = f"""
-        You are an autonomous orchestrator.
-        Goal: {goal}
-        
-        Available Agents and Capabilities:
-        {manifest_str}
-        
-        {memory_context}
-        
-        Create a JSON execution plan. The plan should be a list of steps.
-        Each step must have:
-        - "agent": Name of the agent
-        - "capability": The capability to use
-        - "reasoning": Brief reason for this step
-        
-        Order the steps logically to achieve the goal efficiently.
-        IMPORTANT: To avoid duplicates, we must list existing issues BEFORE creating new ones.
+        try:
+            async for event in events.drain(queue, task):
+                yield event
+        finally:
+            # A consumer that stops early (e.g. a closed browser tab) cancels the run
+            if not task.done():
+                task.cancel()
+
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            yield {"type": "run_failed", "time": time.time(), "error": str(task.exception())}
+            raise task.exception()
+        yield {"type": "run_finished", "time": time.time(), "context": task.result()}
+
+    def _build_dependencies(self, plan, registry):
+        # For every step, the indices of earlier steps it must wait for
+        return build_dependencies(plan, registry)
+
+    async def _execute_plan(self, plan, dependencies, registry, context, checkpoint):
+        execution_log = [None] * len(plan)
+        finished = [asyncio.Event() for _ in plan]
+        # A checkpointed step is skipped only if everything it depends on is skipped too;
+        # otherwise its inputs may change and it runs again (finished tickets are still skipped)
+        completed = checkpoint.completed_steps
+        skipped = set()
+        for index in range(len(plan)):
+            if index in completed and dependencies[index] <= skipped:
+                skipped.add(index)
+
+        # A resumed run whose checkpointed context was already filtered is not filtered
+        # again, unless a step that produces the tickets or the issue list runs again
+        producers = {
+            index for index, step in enumerate(plan)
+            if {"tickets", "existing_issues"} & set(
+                (registry.get_capability_io(step.get("agent"), step.get("capability")) or {}).get("outputs", []))
+        }
+        dedup_state = {"done": checkpoint.deduplicated and producers <= skipped}
+
+        async def run_when_ready(index, step):
+            try:
+                if index in skipped:
+                    print(f"[{self.name}] Skipping step {step.get('capability')} (checkpointed)")
+                    execution_log[index] = {"step": step, "status": "success", "duration": 0.0, "resumed": True}
+                    events.emit("step_finished", index=index, agent=step.get("agent"), capability=step.get("capability"),
+                                status="success", duration=0.0, error=None)
+                    return
+                for dep in dependencies[index]:
+                    await finished[dep].wait()
+                events.emit("step_started", index=index, agent=step.get("agent"), capability=step.get("capability"))
+                with tracing.span("orchestrator.step", target=step.get("capability"), agent=step.get("agent"), index=index) as step_span:
+                    execution_log[index] = await self._run_step(step, registry, context)
+                    entry = execution_log[index]
+                    step_span.set(status=entry["status"])
+                    if entry.get("error"):
+                        step_span.fail(entry["error"])
+                events.emit(
+                    "step_finished", index=index, agent=step.get("agent"), capability=step.get("capability"),
+                    status=entry["status"], duration=entry.get("duration"), error=entry.get("error"),
+                )
+                # Post-processing for optimization (Duplicate Filtering), once both sides are known
+                if (not dedup_state["done"] and "tickets" in context and "existing_issues" in context
+                        and all(finished[i].is_set() for i in producers - {index})):
+                    self._filter_duplicates(context)
+                    dedup_state["done"] = True
+                    checkpoint.mark_deduplicated()
+                if entry["status"] == "success":
+                    checkpoint.step_done(index, context)
+            finally:
+                finished[index].set()
+
+        await asyncio.gather(*[run_when_ready(i, step) for i, step in enumerate(plan)])
+        return execution_log
+
+    async def _run_step(self, step, registry, context):
+        agent_name = step.get("agent")
+        capability = step.get("capability")
+        reasoning = step.get("reasoning")
         
-        Return ONLY the JSON list.
-        """
+        print(f"[{self.name}] Executing Step: {capability} ({reasoning})")
         
+        agent = registry.get_agent(agent_name)
+        if not agent:
+            print(f"[{self.name}] Agent {agent_name} not found. Skipping.")
+            return {"step": step, "status": "failed", "error": "Agent not found"}
+
+        # Each step gets its own view of the context so concurrent steps
+        # cannot see each other's per-step keys such as 'action'
+        step_context = dict(context)
+        # Special handling for GitHubExecutor which needs 'action'
+        if agent_name == "GitHubExecutor":
+            if "list" in capability:
+                step_context["action"] = "list_issues"
+            elif "create" in capability:
+                step_context["action"] = "create_issues"
+                # GitHubExecutor expects 'impact_analysis'; DesignAnalyzer returns 'design_analysis'
+                if "design_analysis" in context:
+                    context["impact_analysis"] = context["design_analysis"]
+                    step_context["impact_analysis"] = context["design_analysis"]
+
+        started = time.monotonic()
         try:
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            # Clean up markdown code blocks if present
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.endswith("```"):
-                text = text[:-3]
-            return json.loads(text)
+            # Execute
+            if registry.takes_repo(agent_name):
+                io = registry.get_capability_io(agent_name, capability) or {"inputs": []}
+                result = await self._run_per_repo(agent, io["inputs"], step_context, context)
+            else:
+                result = await agent.run(step_context)
+            context.update(result)
+            duration = round(time.monotonic() - started, 3)
+            print(f"[{self.name}] Step {capability} finished in {duration}s")
+            # Per-ticket failures leave the step open so a resume retries just those tickets
+            failed_items = len(result.get("analysis_errors") or []) + sum(
+                1 for issue in result.get("created_issues") or [] if isinstance(issue, dict) and issue.get("status") != "created"
+            )
+            if failed_items:
+                return {"step": step, "status": "partial", "duration": duration, "error": f"{failed_items} items failed"}
+            return {"step": step, "status": "success", "duration": duration}
         except Exception as e:
-            print(f"[{self.name}] Planning failed: {e}. Fallback to hardcoded plan.")
-            return [
-                {"agent": "JiraCollector", "capability": "fetch_jira_tickets", "reasoning": "Get new work"},
-                {"agent": "GitHubExecutor", "capability": "list_github_issues", "reasoning": "Check existing work"},
-                {"agent": "DesignAnalyzer", "capability": "analyze_design_impact", "reasoning": "Analyze design"},
-                {"agent": "GitHubExecutor", "capability": "create_github_issues", "reasoning": "Create tasks"}
-            ]
+            print(f"[{self.name}] Step failed: {e}")
+            return {"step": step, "status": "failed", "error": str(e), "duration": round(time.monotonic() - started, 3)}
+
+    def _ticket_routes(self, context, table):
+        # Set by duplicate filtering (routes minus repos that already have the issue)
+        routes = context.get("ticket_routes")
+        if routes is None:
+            routes = {ticket.get('key'): table.route(ticket) for ticket in context.get("tickets", [])}
+        return routes
+
+    async def _run_per_repo(self, agent, inputs, step_context, context):
+        # Split the step's work by target repository and run the repos concurrently.
+        # Each repo run sees only its own tickets, so design context and the issue
+        # index are built once per repo for all of its tickets.
+        table = load_routing()
+        groups = {}
+        if "impact_analysis" in inputs:
+            for item in step_context.get("impact_analysis", []):
+                groups.setdefault(item.get("repo") or table.default[0], {}).setdefault("impact_analysis", []).append(item)
+        elif "tickets" in inputs:
+            routes = self._ticket_routes(context, table)
+            for ticket in step_context.get("tickets", []):
+                for repo in routes.get(ticket.get('key'), table.default):
+                    groups.setdefault(repo, {}).setdefault("tickets", []).append(ticket)
+        else:
+            groups = {repo: {} for repo in table.all_repos()}
+        if not groups:
+            groups = {table.default[0]: {key: [] for key in inputs if key in ("tickets", "impact_analysis")}}
+
+        async def run_repo(repo, repo_inputs):
+            repo_owner, repo_name = split_slug(repo)
+            repo_context = dict(step_context, repo_owner=repo_owner, repo_name=repo_name)
+            repo_context.update(repo_inputs)
+            return repo, await agent.run(repo_context)
+
+        if len(groups) > 1:
+            print(f"[{self.name}] Fanning out to {len(groups)} repositories: {list(groups)}")
+        merged = {}
+        for repo, result in await asyncio.gather(*[run_repo(repo, repo_inputs) for repo, repo_inputs in groups.items()]):
+            for key, value in result.items():
+                if isinstance(value, list):
+                    merged.setdefault(key, []).extend(value)
+                else:
+                    merged.setdefault(f"{key}_by_repo", {})[repo] = value
+                    merged[key] = value
+        return merged
+
+    def _plan_fingerprint(self, goal, manifests):
+        return plan_fingerprint(goal, manifests)
+
+    def _generate_plan(self, goal, manifests, successful_plans):
+        return generate_plan(goal, manifests, successful_plans)
 
     def _filter_duplicates(self, context):
         tickets = context.get("tickets", [])
         existing_issues = context.get("existing_issues", [])
-        existing_titles = [issue.get("title", "") for issue in existing_issues]
+        table = load_routing()
         
         print(f"[{self.name}] Filtering {len(tickets)} tickets against {len(existing_issues)} existing issues...")
+        index_paths = context.get("issue_index_by_repo") or {}
+        detectors = {}
+
+        def detector_for(repo):
+            if repo not in detectors:
+                path = index_paths.get(repo) or (context.get("issue_index") if not index_paths else None)
+                if path:
+                    detectors[repo] = detector_for_index(IssueIndex.from_path(path))
+                else:
+                    detectors[repo] = DuplicateDetector.from_issues(existing_issues)
+            return detectors[repo]
+
+        # A ticket is checked against every repository it routes to and keeps only
+        # the repositories that do not have an issue for it yet
         new_tickets = []
+        near_duplicates = []
+        ticket_routes = {}
         for ticket in tickets:
             key = ticket.get('key')
-            # Assuming a naming convention for issues
-            expected_title = f"Implement changes for {key}"
-            
-            # Check if any existing issue title contains the key or matches the expected title
-            is_duplicate = False
-            for title in existing_titles:
-                if key in title:
-                    is_duplicate = True
-                    break
-            
-            if is_duplicate:
-                print(f"[{self.name}] Skipping {key} (Already exists)")
-            else:
+            remaining = []
+            for repo in table.route(ticket):
+                match = detector_for(repo).check_ticket(ticket)
+                if match["exact"]:
+                    print(f"[{self.name}] Skipping {key} for {repo} (Already exists)")
+                    continue
+                if match["near"]:
+                    # Near-duplicates are only flagged; the ticket may be genuinely new work
+                    print(f"[{self.name}] {key} looks similar to existing issue(s) {[m['number'] for m in match['near']]} in {repo}")
+                    near_duplicates.append({"ticket": key, "repo": repo, "issues": match["near"]})
+                remaining.append(repo)
+            if remaining:
                 new_tickets.append(ticket)
+                ticket_routes[key] = remaining
         
         context["tickets"] = new_tickets
+        context["ticket_routes"] = ticket_routes
+        context["near_duplicates"] = near_duplicates
         print(f"[{self.name}] {len(new_tickets)} new tickets to process.")
@@ -0,0 +1,106 @@
+import json
+import hashlib
+import model_router
+
+# Planning helpers shared by the orchestrator and the headless CLI. Nothing here
+# imports an SDK at module level: the router only loads the Gemini client when a
+# plan actually has to be generated.
+
+GOAL = "Fetch Jira tickets, check against existing GitHub issues to avoid duplicates, analyze design impact for new tickets, and create GitHub issues."
+
+FALLBACK_PLAN = [
+    {"agent": "JiraCollector", "capability": "fetch_jira_tickets", "reasoning": "Get new work"},
+    {"agent": "GitHubExecutor", "capability": "list_github_issues", "reasoning": "Check existing work"},
+    {"agent": "DesignAnalyzer", "capability": "analyze_design_impact", "reasoning": "Analyze design"},
+    {"agent": "GitHubExecutor", "capability": "create_github_issues", "reasoning": "Create tasks"}
+]
+
+# Context keys that agents consume under a different name than the producer emits
+INPUT_ALIASES = {"impact_analysis": "design_analysis"}
+
+def build_dependencies(plan, registry):
+    # For every step, the indices of earlier steps it must wait for
+    last_writer = {}
+    readers = {}
+    dependencies = []
+    for index, step in enumerate(plan):
+        io = registry.get_capability_io(step.get("agent"), step.get("capability"))
+        if io is None:
+            # Unknown I/O: stay conservative and wait for everything before it
+            dependencies.append(set(range(index)))
+            for key in list(last_writer):
+                last_writer[key] = index
+            continue
+
+        inputs = {INPUT_ALIASES.get(key, key) for key in io["inputs"]}
+        outputs = set(io["outputs"])
+        # Tickets are de-duplicated against existing issues before anyone consumes them
+        if "tickets" in inputs and "existing_issues" in last_writer:
+            inputs.add("existing_issues")
+
+        deps = {last_writer[key] for key in inputs if key in last_writer}
+        for key in outputs:
+            if key in last_writer:
+                deps.add(last_writer[key])
+            deps.update(readers.get(key, ()))
+        dependencies.append(deps)
+
+        for key in inputs:
+            readers.setdefault(key, set()).add(index)
+        for key in outputs:
+            last_writer[key] = index
+            readers[key] = set()
+    return dependencies
+
+def plan_fingerprint(goal, manifests):
+    # Manifests are sorted by name so discovery order does not change the fingerprint
+    ordered = sorted(manifests, key=lambda m: m.get("name", ""))
+    payload = json.dumps({"goal": goal, "manifests": ordered}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def generate_plan(goal, manifests, successful_plans):
+    # Prompt Gemini to generate a plan
+    manifest_str = json.dumps(manifests, indent=2)
+
+    # Format memory for context
+    memory_context = ""
+    if successful_plans:
+        memory_context = f"\nHere are examples of successful plans from the past:\n{json.dumps(successful_plans, indent=2)}\n"
+
+    prompt = f"""
+    You are an autonomous orchestrator.
+    Goal: {goal}
+
+    Available Agents and Capabilities:
+    {manifest_str}
+
+    {memory_context}
+
+    Create a JSON execution plan. The plan should be a list of steps.
+    Each step must have:
+    - "agent": Name of the agent
+    - "capability": The capability to use
+    - "reasoning": Brief reason for this step
+
+    Order the steps logically to achieve the goal efficiently.
+    IMPORTANT: To avoid duplicates, we must list existing issues BEFORE creating new ones.
+
+    Return ONLY the JSON list.
+    """
+
+    try:
+        text = model_router.generate("planner", prompt, validate=model_router.parse_json_reply)
+        return model_router.parse_json_reply(text)
+    except Exception as e:
+        print(f"[Planner] Planning failed: {e}. Fallback to hardcoded plan.")
+        return [dict(step) for step in FALLBACK_PLAN]
+
+def plan_stages(plan, dependencies):
+    # Groups of step indices that can run together, in order (for dry runs and logs)
+    stage_of = {}
+    for index in range(len(plan)):
+        stage_of[index] = 1 + max((stage_of[dep] for dep in dependencies[index]), default=-1)
+    stages = {}
+    for index, stage in stage_of.items():
+        stages.setdefault(stage, []).append(index)
+    return [stages[stage] for stage in sorted(stages)]
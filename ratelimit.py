@@ -0,0 +1,146 @@
+import os
+import re
+import time
+import random
+import asyncio
+from collections import deque
+import tracing
+
+# Client-side limits for GitHub content creation. GitHub's secondary rate limits
+# allow roughly 80 content-creating requests per minute and 500 per hour, and its
+# guidance is to create content serially with at least a second between requests.
+# Issue creation goes through all three: a minimum spacing, a per-minute token
+# bucket and a sliding one-hour window. Rate-limit errors that still happen are
+# retried with jittered exponential backoff, honouring Retry-After when sent.
+
+GITHUB_CREATE_PER_MINUTE = float(os.getenv("GITHUB_CREATE_PER_MINUTE", "80"))
+GITHUB_CREATE_BURST = int(os.getenv("GITHUB_CREATE_BURST", "1"))
+GITHUB_CREATE_PER_HOUR = int(os.getenv("GITHUB_CREATE_PER_HOUR", "500"))
+# Seconds between two content-creating requests (0 disables the spacing)
+GITHUB_CREATE_MIN_INTERVAL = float(os.getenv("GITHUB_CREATE_MIN_INTERVAL", "1.0"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("GITHUB_RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 120.0
+
+# 429 is always a rate limit; GitHub also answers 403 for permission errors, so a
+# 403 counts only when its message names the (secondary) rate limit or abuse detection
+RATE_LIMIT_RE = re.compile(r"\b429\b|rate[- ]limit|abuse detection|too many requests", re.IGNORECASE)
+RETRY_AFTER_RE = re.compile(r"retry[-_ ]after[\"':=\s]*(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+class RateLimitError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def rate_limit_error(text):
+    # MCP servers surface HTTP errors as text; returns a RateLimitError or None
+    if not text or not RATE_LIMIT_RE.search(text):
+        return None
+    match = RETRY_AFTER_RE.search(text)
+    return RateLimitError(text, float(match.group(1)) if match else None)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        # Tokens may go negative: each caller reserves the next slot and sleeps until it
+        # is due, which keeps arrival order without a lock tied to one event loop
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            # Only actual waits are traced, so a throttled run shows where its time went
+            wait = -self.tokens / self.rate
+            with tracing.span("ratelimit.wait", seconds_reserved=round(wait, 3)):
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        # A server-side limit was hit: drain the bucket so nobody else fires for a while
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+        self.updated = time.monotonic()
+
+
+class SlidingWindowLimit:
+    # At most `limit` acquisitions in any `period` seconds. A token bucket refilling
+    # at limit/period would allow up to twice that in one window after a burst.
+    def __init__(self, limit, period):
+        self.limit = max(1, limit)
+        self.period = period
+        self.slots = deque()
+
+    async def acquire(self):
+        # Like TokenBucket, each caller reserves its slot up front and sleeps until it is due
+        now = time.monotonic()
+        while self.slots and self.slots[0] <= now - self.period:
+            self.slots.popleft()
+        slot = now
+        if len(self.slots) >= self.limit:
+            slot = self.slots[-self.limit] + self.period
+        self.slots.append(slot)
+        if slot > now:
+            with tracing.span("ratelimit.wait", seconds_reserved=round(slot - now, 3), window=self.period):
+                await asyncio.sleep(slot - now)
+
+
+class CombinedLimit:
+    # Waits for every limit in turn; the longest window goes first so the shorter
+    # ones (e.g. the minimum spacing) are measured at the moment the request is sent
+    def __init__(self, *limits):
+        self.limits = limits
+
+    async def acquire(self):
+        for limit in self.limits:
+            await limit.acquire()
+
+    def pause(self, seconds):
+        for limit in self.limits:
+            if hasattr(limit, "pause"):
+                limit.pause(seconds)
+
+
+def backoff_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(RETRY_MAX_DELAY, retry_after) + random.uniform(0, 1)
+    # Full jitter
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+async def call_with_backoff(call, bucket=None, max_attempts=RETRY_MAX_ATTEMPTS):
+    # call() is retried only for RateLimitError; anything else propagates at once
+    for attempt in range(max_attempts):
+        if bucket is not None:
+            await bucket.acquire()
+        try:
+            return await call()
+        except RateLimitError as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt, e.retry_after)
+            if bucket is not None:
+                bucket.pause(delay)
+            print(f"[RateLimit] Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_attempts})")
+            with tracing.span("ratelimit.backoff", attempt=attempt + 1):
+                await asyncio.sleep(delay)
+
+
+_github_bucket = None
+
+
+def github_content_bucket():
+    # Secondary limits are per user, so every run in the process shares one limiter
+    global _github_bucket
+    if _github_bucket is None:
+        limits = [SlidingWindowLimit(GITHUB_CREATE_PER_HOUR, 3600.0),
+                  TokenBucket(GITHUB_CREATE_PER_MINUTE / 60.0, GITHUB_CREATE_BURST)]
+        if GITHUB_CREATE_MIN_INTERVAL > 0:
+            limits.append(TokenBucket(1.0 / GITHUB_CREATE_MIN_INTERVAL, 1))
+        _github_bucket = CombinedLimit(*limits)
+    return _github_bucket
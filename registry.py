@@ -0,0 +1,119 @@
+import os
+import glob
+import json
+import importlib
+from mcp_pool import get_shared_pool
+
+# Process-wide agent registry. Manifests (agent cards) are cached and re-read only
+# when a file's mtime changes; capability lookup is a dict; agents are imported
+# and constructed from the manifest's "module"/"class" the first time a plan step
+# asks for them, so agents a plan never touches cost nothing.
+
+MANIFEST_DIR = "manifests"
+
+
+class AgentRegistry:
+    def __init__(self, mcp_pool=None, manifest_dir=MANIFEST_DIR):
+        self.manifest_dir = manifest_dir
+        self.agents = {}
+        self.manifests = {}
+        self.capabilities = {}
+        self._mtimes = {}
+        self._names_by_path = {}
+        # MCP sessions outlive the registry by default: the process-wide pool keeps
+        # servers warm across runs and is handed to agents through the run context.
+        self.mcp_pool = mcp_pool or get_shared_pool()
+        self.refresh()
+
+    def refresh(self):
+        # One stat per manifest; only new or modified cards are parsed again
+        paths = glob.glob(os.path.join(self.manifest_dir, "*.json"))
+        current = {}
+        for path in paths:
+            try:
+                current[path] = os.path.getmtime(path)
+            except OSError:
+                continue
+        if current == self._mtimes:
+            return False
+
+        for path in set(self._mtimes) - set(current):
+            self._forget(self._names_by_path.pop(path, None))
+        for path, mtime in current.items():
+            if self._mtimes.get(path) == mtime:
+                continue
+            try:
+                with open(path, "r") as f:
+                    manifest = json.load(f)
+                name = manifest["name"]
+            except Exception as e:
+                # A broken card is skipped; whatever it used to provide is dropped with it
+                print(f"Error loading manifest {path}: {e}")
+                self._forget(self._names_by_path.pop(path, None))
+                continue
+            self._forget(self._names_by_path.get(path))
+            self._forget(name)
+            self.manifests[name] = manifest
+            self._names_by_path[path] = name
+        self._mtimes = current
+
+        self.capabilities = {}
+        for name, manifest in self.manifests.items():
+            for capability in manifest.get("capabilities", []):
+                self.capabilities.setdefault(capability, name)
+        return True
+
+    def _forget(self, name):
+        # A changed or removed card drops its agent so the next lookup rebuilds it
+        if name:
+            self.manifests.pop(name, None)
+            self.agents.pop(name, None)
+
+    def get_agent(self, name):
+        agent = self.agents.get(name)
+        if agent is not None:
+            return agent
+        manifest = self.manifests.get(name)
+        if not manifest or not manifest.get("module"):
+            return None
+        try:
+            module = importlib.import_module(manifest["module"])
+            agent = getattr(module, manifest.get("class") or name)()
+        except Exception as e:
+            print(f"Error loading agent {name} from {manifest['module']}: {e}")
+            return None
+        self.agents[name] = agent
+        return agent
+
+    def get_all_manifests(self):
+        self.refresh()
+        return list(self.manifests.values())
+
+    def get_capability_io(self, agent_name, capability):
+        # Per-capability inputs/outputs, falling back to the manifest-wide declaration
+        manifest = self.manifests.get(agent_name)
+        if not manifest or capability not in manifest.get("capabilities", []):
+            return None
+        io = manifest.get("capability_io", {}).get(capability)
+        if io is None:
+            io = {"inputs": list(manifest.get("inputs", {})), "outputs": list(manifest.get("outputs", {}))}
+        return {"inputs": list(io.get("inputs", [])), "outputs": list(io.get("outputs", []))}
+
+    def takes_repo(self, agent_name):
+        # Agents that declare repo_owner/repo_name inputs are run once per routed repository
+        manifest = self.manifests.get(agent_name) or {}
+        return "repo_owner" in manifest.get("inputs", {})
+
+    def get_agent_for_capability(self, capability):
+        name = self.capabilities.get(capability)
+        return self.get_agent(name) if name else None
+
+
+_shared_registry = None
+
+
+def get_shared_registry():
+    global _shared_registry
+    if _shared_registry is None:
+        _shared_registry = AgentRegistry()
+    return _shared_registry
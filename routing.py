@@ -0,0 +1,88 @@
+import os
+import json
+
+# Routing table from Jira project / component to the GitHub repositories a ticket's
+# work lands in. routing.json looks like:
+#   {
+#     "default": ["akshay-mp/simple_production_rag"],
+#     "projects": {"KAN": ["akshay-mp/simple_production_rag"]},
+#     "components": {"Frontend": ["acme/web", "acme/design-system"]}
+#   }
+# Component routes win over project routes, which win over the default. Without a
+# routing file every ticket goes to GITHUB_REPO_OWNER/GITHUB_REPO_NAME.
+
+ROUTING_FILE = os.getenv("REPO_ROUTING_FILE", "routing.json")
+DEFAULT_REPO_OWNER = os.getenv("GITHUB_REPO_OWNER", "akshay-mp")
+DEFAULT_REPO_NAME = os.getenv("GITHUB_REPO_NAME", "simple_production_rag")
+
+_cache = {}
+
+
+def repo_slug(owner, name):
+    return f"{owner}/{name}"
+
+
+def split_slug(slug):
+    owner, _, name = slug.partition("/")
+    return owner, name
+
+
+def _normalize(repos):
+    if isinstance(repos, str):
+        repos = [repos]
+    slugs = []
+    for repo in repos or []:
+        if isinstance(repo, dict):
+            repo = repo_slug(repo.get("owner", ""), repo.get("repo", ""))
+        owner, name = split_slug(repo)
+        if owner and name and repo not in slugs:
+            slugs.append(repo)
+    return slugs
+
+
+class RoutingTable:
+    def __init__(self, data=None):
+        data = data or {}
+        self.default = _normalize(data.get("default")) or [repo_slug(DEFAULT_REPO_OWNER, DEFAULT_REPO_NAME)]
+        self.projects = {key.upper(): _normalize(repos) for key, repos in (data.get("projects") or {}).items()}
+        self.components = {name.lower(): _normalize(repos) for name, repos in (data.get("components") or {}).items()}
+
+    def route(self, ticket):
+        fields = ticket.get("fields", {}) or {}
+        repos = []
+        for component in fields.get("components") or []:
+            name = component.get("name", "") if isinstance(component, dict) else str(component)
+            for slug in self.components.get(name.lower(), []):
+                if slug not in repos:
+                    repos.append(slug)
+        if repos:
+            return repos
+        project = (fields.get("project") or {}).get("key") or (ticket.get("key") or "").rpartition("-")[0]
+        return list(self.projects.get(project.upper(), self.default))
+
+    def all_repos(self):
+        slugs = list(self.default)
+        for repos in list(self.projects.values()) + list(self.components.values()):
+            slugs.extend(slug for slug in repos if slug not in slugs)
+        return slugs
+
+
+def load_routing(path=ROUTING_FILE):
+    # Reloaded only when the file changes
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    data = {}
+    if mtime is not None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Routing] Could not read {path}: {e}. Using the default repository.")
+    table = RoutingTable(data)
+    _cache[path] = (mtime, table)
+    return table
@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Lightweight tracing and metrics, stdlib only so it can be imported anywhere.
+#   span(name, **attributes)   times a block; nested spans (including those in tasks
+#                              spawned inside it) become its children
+#   trace(name, **attributes)  root span that also collects every span of the trace,
+#                              for a per-run export and summary
+#   count(name, value, **labels)  a Prometheus counter
+# Finished spans feed a duration histogram per (span, target) and a bounded buffer of
+# recent spans. Traces are exported as OTLP/JSON (what OpenTelemetry collectors accept
+# on /v1/traces) and metrics as Prometheus text.
+#
+# Span names: orchestrator.run, orchestrator.plan, orchestrator.step, daemon.ticket,
+# mcp.spawn, mcp.initialize, mcp.call_tool, llm.generate, llm.escalate, ratelimit.wait
+# and ratelimit.backoff. The "target" attribute names what was called (capability,
+# tool, server or LLM call site). It is a metric label, so it must come from a small
+# fixed set; per-item values such as ticket keys go in other attributes.
+
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join("data", "traces"))
+# Write data/traces/<run_id>.json after every orchestrator run
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "1").lower() not in ("0", "false", "no")
+# Recent spans kept in memory for the daemon's /traces endpoint
+TRACE_BUFFER_SPANS = int(os.getenv("TRACE_BUFFER_SPANS", "2000"))
+SERVICE_NAME = "change-management-assistant"
+METRIC_PREFIX = "change_assistant_"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# OTLP span kinds: internal work vs calls out to another service
+CLIENT_SPANS = {"mcp.call_tool", "mcp.initialize", "llm.generate"}
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+_collector = contextvars.ContextVar("tracing_collector", default=None)
+_lock = threading.Lock()
+_recent = deque(maxlen=TRACE_BUFFER_SPANS)
+_histograms = {}
+_counters = {}
+
+
+def _new_id(size):
+    return os.urandom(size).hex()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, attributes, parent=None, start_ns=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def fail(self, message):
+        self.error = str(message)[:500]
+
+    @property
+    def seconds(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def finish(self, end_ns=None):
+        self.end_ns = end_ns or time.time_ns()
+        collector = _collector.get()
+        with _lock:
+            if collector is not None and collector.trace_id == self.trace_id:
+                collector.spans.append(self)
+            _recent.append(self)
+            _observe(self.name, self.attributes.get("target", ""), self.seconds)
+            if self.error is not None:
+                _inc(f"{METRIC_PREFIX}span_errors_total", {"span": self.name, "target": self.attributes.get("target", "")}, 1)
+
+
+@contextmanager
+def span(name, **attributes):
+    current = Span(name, attributes, _current.get())
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(str(e) or type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+
+
+def record(name, start_ns, end_ns, error=None, **attributes):
+    # For intervals measured elsewhere (e.g. inside a connection's owner task)
+    finished = Span(name, attributes, _current.get(), start_ns)
+    if error is not None:
+        finished.fail(error)
+    finished.finish(end_ns)
+    return finished
+
+
+def current_span():
+    return _current.get()
+
+
+class Trace:
+    def __init__(self, root):
+        self.root = root
+        self.trace_id = root.trace_id
+        self.spans = []
+
+    def summary(self):
+        return summarize(self.spans)
+
+    def export(self, name, directory=TRACE_DIR):
+        if not TRACE_EXPORT:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            write_otlp(self.spans, f)
+        os.replace(tmp_path, path)
+        return path
+
+
+@contextmanager
+def trace(name, **attributes):
+    # A new trace, even when called inside another span (e.g. one per daemon ticket)
+    root = Span(name, attributes)
+    collected = Trace(root)
+    span_token = _current.set(root)
+    collector_token = _collector.set(collected)
+    try:
+        yield collected
+    except BaseException as e:
+        root.fail(str(e) or type(e).__name__)
+        raise
+    finally:
+        _current.reset(span_token)
+        # The root finishes while its collector is still installed, so it is collected too
+        root.finish()
+        _collector.reset(collector_token)
+
+
+# Metrics
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _observe(span_name, target, seconds):
+    key = (span_name, str(target))
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = {"buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0}
+    for i, bound in enumerate(DURATION_BUCKETS):
+        if seconds <= bound:
+            histogram["buckets"][i] += 1
+    histogram["count"] += 1
+    histogram["sum"] += seconds
+
+
+def _inc(name, labels, value):
+    key = (name, _label_key(labels))
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def count(name, value=1, **labels):
+    if value:
+        with _lock:
+            _inc(f"{METRIC_PREFIX}{name}", labels, value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        histograms = {key: {"buckets": list(h["buckets"]), "count": h["count"], "sum": h["sum"]} for key, h in _histograms.items()}
+        counters = dict(_counters)
+    metric = f"{METRIC_PREFIX}span_duration_seconds"
+    lines.append(f"# HELP {metric} Duration of traced operations.")
+    lines.append(f"# TYPE {metric} histogram")
+    for (span_name, target), histogram in sorted(histograms.items()):
+        base = [("span", span_name), ("target", target)]
+        for bound, value in zip(DURATION_BUCKETS, histogram["buckets"]):
+            lines.append(f"{metric}_bucket{_labels(base + [('le', repr(bound))])} {value}")
+        lines.append(f"{metric}_bucket{_labels(base + [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{metric}_sum{_labels(base)} {histogram['sum']:.6f}")
+        lines.append(f"{metric}_count{_labels(base)} {histogram['count']}")
+    declared = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in declared:
+            declared.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Export
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(item):
+    entry = {
+        "traceId": item.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        "kind": 3 if item.name in CLIENT_SPANS else 1,
+        "startTimeUnixNano": str(item.start_ns),
+        "endTimeUnixNano": str(item.end_ns or item.start_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in item.attributes.items()],
+        "status": {"code": 2, "message": item.error} if item.error is not None else {"code": 1},
+    }
+    if item.parent_id:
+        entry["parentSpanId"] = item.parent_id
+    return entry
+
+
+def _otlp_envelope(spans):
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+    }]}
+
+
+def to_otlp(spans):
+    return _otlp_envelope([_otlp_span(item) for item in spans])
+
+
+def write_otlp(spans, f):
+    # Streams one span at a time, so exporting a large run does not double its memory
+    head, tail = json.dumps(_otlp_envelope("SPANS")).split('"SPANS"', 1)
+    f.write(head + "[")
+    for i, item in enumerate(spans):
+        if i:
+            f.write(",")
+        f.write(json.dumps(_otlp_span(item)))
+    f.write("]" + tail)
+
+
+def recent_otlp(limit=None):
+    with _lock:
+        spans = list(_recent)
+    return to_otlp(spans[-limit:] if limit else spans)
+
+
+def summarize(spans):
+    # Compact per-run rollup for the orchestrator memory. Seconds are summed over
+    # spans, so concurrent spans add up to more than the run's wall time.
+    by_name = {}
+    llm = {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "output_tokens": 0}
+    mcp = {"calls": 0, "errors": 0, "request_bytes": 0, "response_bytes": 0}
+    for item in spans:
+        stats = by_name.setdefault(item.name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "errors": 0})
+        stats["count"] += 1
+        stats["seconds"] += item.seconds
+        stats["max_seconds"] = max(stats["max_seconds"], item.seconds)
+        stats["errors"] += item.error is not None
+        attributes = item.attributes
+        if item.name == "llm.generate":
+            llm["calls"] += 1
+            llm["cache_hits"] += bool(attributes.get("cache_hit"))
+            llm["prompt_tokens"] += attributes.get("prompt_tokens", 0)
+            llm["output_tokens"] += attributes.get("output_tokens", 0)
+        elif item.name == "mcp.call_tool":
+            mcp["calls"] += 1
+            mcp["errors"] += item.error is not None
+            mcp["request_bytes"] += attributes.get("request_bytes", 0)
+            mcp["response_bytes"] += attributes.get("response_bytes", 0)
+    for stats in by_name.values():
+        stats["seconds"] = round(stats["seconds"], 4)
+        stats["max_seconds"] = round(stats["max_seconds"], 4)
+    slowest = sorted((item for item in spans if item.parent_id), key=lambda item: item.seconds, reverse=True)[:5]
+    return {
+        "trace_id": spans[0].trace_id if spans else None,
+        "spans": by_name,
+        "llm": llm,
+        "mcp": mcp,
+        "slowest": [{"name": item.name, "target": item.attributes.get("target"), "seconds": round(item.seconds, 4)} for item in slowest],
+    }
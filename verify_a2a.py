@@ -29,7 +29,7 @@ async def main():
     if issues:
         print("Created Issues:")
         for issue in issues:
-            print(f" - {issue}")
+            print(f" - {issue['ticket']}: {issue['status']} #{issue['number']} {issue['url'] or issue['error'] or ''}")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,74 @@
+import os
+import re
+import sys
+import subprocess
+
+# Startup-budget regression check for the headless CLI, based on `python -X importtime`.
+#  1. `import cli` must stay under IMPORT_TIME_BUDGET_MS (best of a few runs, to ride out noise).
+#  2. Neither importing the CLI nor a dry run may load Gradio or the heavy SDKs.
+# Exits non-zero on failure so it can gate CI.
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "300"))
+RUNS = 3
+HEAVY_MODULES = ("gradio", "google.adk", "google.generativeai", "mcp", "numpy")
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def importtime(args):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        modules[name] = cumulative
+        # Top-level imports (one space of indent) add up to the whole import cost
+        if len(indent) == 1:
+            total_us += cumulative
+    return total_us / 1000.0, modules
+
+
+def heavy_imports(modules):
+    return sorted(name for name in modules if any(name == heavy or name.startswith(heavy + ".") for heavy in HEAVY_MODULES))
+
+
+def main():
+    failures = []
+
+    timings = []
+    for _ in range(RUNS):
+        total_ms, modules = importtime(["-c", "import cli"])
+        timings.append(total_ms)
+    best = min(timings)
+    print(f"import cli: best {best:.1f} ms of {[round(t, 1) for t in timings]} (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    if best > IMPORT_TIME_BUDGET_MS:
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:10]
+        failures.append(f"import cli took {best:.1f} ms; slowest: {slowest}")
+    heavy = heavy_imports(modules)
+    if heavy:
+        failures.append(f"import cli loads heavy modules: {heavy}")
+
+    # A dry run without the planner LLM plans from manifests and memory only
+    _, modules = importtime(["-m", "cli", "dry-run", "--no-llm"])
+    heavy = heavy_imports(modules)
+    print(f"cli dry-run --no-llm: {len(modules)} modules imported")
+    if heavy:
+        failures.append(f"cli dry-run loads heavy modules: {heavy}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("Import-time budget OK.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())